@@ -1,26 +1,1451 @@
 
 import os
+import re
+import csv
+import copy
+import json
+import errno
+import struct
 import shutil
 import hashlib
-from pathlib import Path
-from datetime import datetime
-from collections import defaultdict
+import sqlite3
+import time
+import itertools
+import functools
+import contextlib
+import ctypes
+import heapq
+import tempfile
+import mmap
+import stat as stat_module
+import threading
+from array import array
+from collections import defaultdict, namedtuple, OrderedDict
+from collections.abc import ItemsView, Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    _renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+except (OSError, TypeError, AttributeError):  # Windows, macOS, old glibc
+    _renameat2 = None
+
+
+class FileEntry(namedtuple('FileEntry', ['name', 'path', 'stat'])):
+    """Compact scan record holding the one cached stat of a regular file."""
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return self.stat.st_size
+
+    @property
+    def mtime(self):
+        return self.stat.st_mtime
+
+
+class MoveResult(namedtuple('MoveResult', ['src', 'dst', 'status'])):
+    """Outcome of OrganizerCore.move_file.
+
+    status is 'moved', 'unchanged' (already in place), 'skipped' (an
+    identical file sits at dst, src left alone) or 'deduped' (same, and
+    src was removed).
+    """
+    __slots__ = ()
+
+    @property
+    def moved(self):
+        return self.status == 'moved'
+
+
+class IgnoreRules:
+    """Compiled .organizerignore patterns using gitignore semantics.
+
+    Supports comments, '!' negation, trailing '/' for directory-only rules,
+    leading or embedded '/' for rules anchored at the scan root, and the
+    '*', '?', '[...]' and '**' wildcards. The last matching rule wins.
+    """
+
+    FILENAME = '.organizerignore'
+    DEFAULT_PATTERNS = ['.git/', 'node_modules/', '__pycache__/', '/' + FILENAME]
+
+    def __init__(self, patterns=()):
+        self.rules = []
+        self._combined = None
+        for pattern in patterns:
+            self.add(pattern)
+
+    @classmethod
+    def load(cls, folder, patterns=(), defaults=True):
+        """Build rules from the defaults, extra patterns and folder's ignore file."""
+        rules = cls(cls.DEFAULT_PATTERNS if defaults else ())
+        for pattern in patterns:
+            rules.add(pattern)
+        try:
+            with open(os.path.join(folder, cls.FILENAME), 'r', encoding='utf-8') as f:
+                for line in f:
+                    rules.add(line)
+        except OSError:
+            pass
+        return rules
+
+    def add(self, pattern):
+        """Compile one gitignore-style line; blanks and comments are ignored."""
+        pattern = pattern.rstrip('\n').rstrip('\r')
+        if not pattern.endswith('\\ '):
+            pattern = pattern.rstrip(' ')
+        if not pattern or pattern.startswith('#'):
+            return
+
+        negate = pattern.startswith('!')
+        if negate or pattern.startswith('\\#') or pattern.startswith('\\!'):
+            pattern = pattern[1:]
+
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        if not pattern:
+            return
+
+        # Patterns with a slash are anchored to the root, others match any basename
+        anchored = '/' in pattern
+        body = self._translate(pattern.lstrip('/'))
+        self.rules.append((body, re.compile(body + r'\Z', re.DOTALL), negate, dir_only, anchored))
+        self._combined = None
+
+    @staticmethod
+    def _translate(pattern):
+        """Translate a gitignore glob into a regular expression body."""
+        out = []
+        i, n = 0, len(pattern)
+        while i < n:
+            c = pattern[i]
+            if c == '*':
+                if pattern.startswith('**/', i):
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+                if pattern.startswith('**', i):
+                    out.append('.*')
+                    i += 2
+                    continue
+                out.append('[^/]*')
+            elif c == '?':
+                out.append('[^/]')
+            elif c == '[':
+                j = pattern.find(']', i + 2)
+                if j == -1:
+                    out.append(re.escape(c))
+                else:
+                    body = pattern[i + 1:j].replace('\\', '\\\\')
+                    if body[0] in '!^':
+                        body = '^' + body[1:]
+                    out.append(f'[{body}]')
+                    i = j
+            elif c == '\\' and i + 1 < n:
+                i += 1
+                out.append(re.escape(pattern[i]))
+            else:
+                out.append(re.escape(c))
+            i += 1
+        return ''.join(out)
+
+    def _compile_combined(self):
+        """Merge negation-free rule sets into one alternation per entry kind."""
+        def join(rules, anchored):
+            bodies = [f"(?:{rule[0]})" for rule in rules if rule[4] == anchored]
+            return re.compile('|'.join(bodies) + r'\Z', re.DOTALL) if bodies else None
+
+        file_rules = [rule for rule in self.rules if not rule[3]]
+        self._combined = ((join(file_rules, True), join(file_rules, False)),
+                          (join(self.rules, True), join(self.rules, False)))
+
+    def matches(self, relpath, name, is_dir):
+        """Return True if the entry at relpath (posix separators) is ignored."""
+        if not self.rules:
+            return False
+
+        if not any(rule[2] for rule in self.rules):
+            if self._combined is None:
+                self._compile_combined()
+            anchored, names = self._combined[1 if is_dir else 0]
+            return bool((names and names.match(name)) or (anchored and anchored.match(relpath)))
+
+        for _, regex, negate, dir_only, anchored in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relpath if anchored else name):
+                return not negate
+        return False
+
+
+class CategoryRules:
+    """Category mapping compiled into an extension hash index.
+
+    A category is a list of extensions or a dict spec with 'extensions',
+    'min_size', 'max_size', 'modified_after', 'modified_before' and
+    'name_regex'; the first matching category wins.
+    """
+
+    def __init__(self, categories, default="Others"):
+        self.default = default
+        by_ext = defaultdict(list)
+        wildcard = []
+
+        for position, (category, spec) in enumerate(categories.items()):
+            if isinstance(spec, dict):
+                extensions = spec.get('extensions') or ()
+                checks = self._compile_checks(spec)
+            else:
+                extensions = spec
+                checks = ()
+
+            rule = (position, category, checks)
+            if extensions:
+                for ext in extensions:
+                    bucket = by_ext[ext.lower()]
+                    if not bucket or bucket[-1] is not rule:
+                        bucket.append(rule)
+            elif checks:
+                wildcard.append(rule)
+
+        # Fold the extension-free rules into every bucket, keeping declaration order
+        self._wildcard = tuple((category, checks) for _, category, checks in wildcard)
+        self._by_ext = {
+            ext: tuple((category, checks) for _, category, checks in sorted(bucket + wildcard))
+            for ext, bucket in by_ext.items()
+        }
+
+    @staticmethod
+    def _compile_checks(spec):
+        """Build the predicate tuple for a dict spec, cheapest checks first."""
+        checks = []
+        min_size, max_size = spec.get('min_size'), spec.get('max_size')
+        if min_size is not None:
+            checks.append(lambda name, size, mtime: size is not None and size >= min_size)
+        if max_size is not None:
+            checks.append(lambda name, size, mtime: size is not None and size <= max_size)
+
+        after, before = spec.get('modified_after'), spec.get('modified_before')
+        if after is not None:
+            checks.append(lambda name, size, mtime: mtime is not None and mtime >= after)
+        if before is not None:
+            checks.append(lambda name, size, mtime: mtime is not None and mtime < before)
+
+        if spec.get('name_regex'):
+            search = re.compile(spec['name_regex']).search
+            checks.append(lambda name, size, mtime: search(name) is not None)
+        return tuple(checks)
+
+    @staticmethod
+    def describe(spec):
+        """Human-readable summary of a category value for the editors."""
+        if not isinstance(spec, dict):
+            return ', '.join(spec)
+        parts = [', '.join(spec.get('extensions') or ()) or 'any extension']
+        for key in ('min_size', 'max_size', 'modified_after', 'modified_before', 'name_regex'):
+            if spec.get(key) is not None:
+                parts.append(f"{key}={spec[key]}")
+        return ' | '.join(parts)
+
+    def knows(self, ext):
+        """Return True if ext is listed by at least one category."""
+        return ext in self._by_ext
+
+    def classify(self, filename, size=None, mtime=None, ext=None):
+        """Return the category for a file, or the default when nothing matches."""
+        if ext is None:
+            ext = os.path.splitext(filename)[1].lower()
+        for category, checks in self._by_ext.get(ext, self._wildcard):
+            for check in checks:
+                if not check(filename, size, mtime):
+                    break
+            else:
+                return category
+        return self.default
+
+
+class ContentSniffer:
+    """Magic-byte file type detection with a per-file-identity result cache.
+
+    Only the first HEADER_SIZE bytes are ever read. Results are cached by
+    (st_dev, st_ino, st_size, st_mtime_ns), so a rescan of an unchanged file
+    never opens it again; hashing can feed its first chunk in via record().
+    """
+
+    HEADER_SIZE = 262
+
+    # (canonical extension, ((offset, magic), ...)) - first match wins
+    SIGNATURES = [
+        ('.png', ((0, b'\x89PNG\r\n\x1a\n'),)),
+        ('.jpg', ((0, b'\xff\xd8\xff'),)),
+        ('.gif', ((0, b'GIF87a'),)),
+        ('.gif', ((0, b'GIF89a'),)),
+        ('.webp', ((0, b'RIFF'), (8, b'WEBP'))),
+        ('.wav', ((0, b'RIFF'), (8, b'WAVE'))),
+        ('.avi', ((0, b'RIFF'), (8, b'AVI '))),
+        ('.tiff', ((0, b'II*\x00'),)),
+        ('.tiff', ((0, b'MM\x00*'),)),
+        ('.ico', ((0, b'\x00\x00\x01\x00'),)),
+        # 'BM' alone matches text; also require the zero reserved fields and
+        # a DIB header size (offset 14) small enough to fit in one byte
+        ('.bmp', ((0, b'BM'), (6, b'\x00\x00\x00\x00'), (15, b'\x00\x00\x00'))),
+        ('.m4a', ((4, b'ftypM4A'),)),
+        ('.mov', ((4, b'ftypqt'),)),
+        ('.mp4', ((4, b'ftyp'),)),
+        ('.mkv', ((0, b'\x1a\x45\xdf\xa3'),)),
+        ('.mp3', ((0, b'ID3'),)),
+        ('.flac', ((0, b'fLaC'),)),
+        ('.ogg', ((0, b'OggS'),)),
+        ('.pdf', ((0, b'%PDF-'),)),
+        ('.rtf', ((0, b'{\\rtf'),)),
+        ('.doc', ((0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'),)),
+        ('.zip', ((0, b'PK\x03\x04'),)),
+        ('.zip', ((0, b'PK\x05\x06'),)),
+        ('.rar', ((0, b'Rar!\x1a\x07'),)),
+        ('.7z', ((0, b"7z\xbc\xaf'\x1c"),)),
+        ('.gz', ((0, b'\x1f\x8b'),)),
+        ('.bz2', ((0, b'BZh'),)),
+        ('.xz', ((0, b'\xfd7zXZ\x00'),)),
+        ('.tar', ((257, b'ustar'),)),
+        # Native binaries share the .exe bucket so they land in Executables
+        ('.exe', ((0, b'MZ'),)),
+        ('.exe', ((0, b'\x7fELF'),)),
+        ('.exe', ((0, b'\xcf\xfa\xed\xfe'),)),
+        ('.py', ((0, b'#!'), (2, b'/usr/bin/env python'))),
+        ('.py', ((0, b'#!'), (2, b'/usr/bin/python'))),
+        ('.sh', ((0, b'#!'),)),
+    ]
+
+    # Extensions that legitimately carry another format's signature
+    CONTAINERS = {
+        '.zip': {'.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.jar', '.apk', '.epub', '.whl'},
+        '.doc': {'.xls', '.ppt', '.msi', '.msg'},
+        '.mp4': {'.m4v', '.m4a', '.mov', '.3gp', '.heic', '.avif'},
+        '.mkv': {'.webm'},
+        '.jpg': {'.jpeg', '.jpe'},
+        '.tiff': {'.tif', '.cr2', '.nef', '.arw', '.dng'},
+        '.exe': {'.dll', '.sys', '.so', '.o', '.bin', '.app'},
+        '.sh': {'.py', '.rb', '.pl', '.bash', '.zsh'},
+        '.gz': {'.tgz'},
+    }
+
+    def __init__(self, max_entries=1 << 20):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path, st):
+        # Windows DirEntry stats carry no inode, so fall back to the path there
+        if st.st_ino:
+            return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        return (path, st.st_size, st.st_mtime_ns)
+
+    @classmethod
+    def match(cls, header):
+        """Return the canonical extension for a header, or None if unknown."""
+        for ext, parts in cls.SIGNATURES:
+            if all(header.startswith(magic, offset) for offset, magic in parts):
+                return ext
+        return None
+
+    def lookup(self, path, st):
+        """Return (hit, ext) for a cached result without touching the file."""
+        key = self._key(path, st)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return True, self._cache[key]
+        return False, None
+
+    def record(self, path, st, header):
+        """Classify an already-read header and cache the result."""
+        ext = self.match(bytes(header[:self.HEADER_SIZE]))
+        with self._lock:
+            self._cache[self._key(path, st)] = ext
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return ext
+
+    def sniff(self, path, st=None):
+        """Return the sniffed extension of path, reading the header at most once."""
+        try:
+            if st is None:
+                st = os.stat(path)
+            hit, ext = self.lookup(path, st)
+            if hit:
+                return ext
+            with open(path, 'rb') as f:
+                header = f.read(self.HEADER_SIZE)
+        except OSError:
+            return None
+        return self.record(path, st, header)
+
+    @classmethod
+    def is_mislabeled(cls, ext, sniffed):
+        """Return True if the sniffed type contradicts the declared extension."""
+        if not sniffed or not ext or ext == sniffed:
+            return False
+        return ext not in cls.CONTAINERS.get(sniffed, ())
+
+
+class HashCache:
+    """Persistent digest cache in SQLite keyed by file identity.
+
+    Rows are trusted only while size and mtime still match; at most
+    max_entries are kept, written in batches of batch_size.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hash_cache.db')
+
+    def __init__(self, path=DEFAULT_PATH, max_entries=2_000_000, batch_size=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._pending = []
+        self._touched = []
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " dev INTEGER, ino INTEGER, algo TEXT, size INTEGER, mtime_ns INTEGER,"
+            " digest TEXT, path TEXT, used INTEGER, UNIQUE (dev, ino, algo))")
+        self._db.execute("CREATE INDEX IF NOT EXISTS hashes_used ON hashes (used)")
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, path, st, algorithm):
+        """Return the cached digest for st, or None if missing or stale."""
+        if not st.st_ino:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, digest FROM hashes WHERE dev=? AND ino=? AND algo=?",
+                (st.st_dev, st.st_ino, algorithm)).fetchone()
+            if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+                return None
+            self._touched.append((int(time.time()), st.st_dev, st.st_ino, algorithm))
+            if len(self._touched) >= self.batch_size:
+                self._flush_locked()
+            return row[2]
+
+    def put(self, path, st, algorithm, digest):
+        """Queue a digest for st; it is written with the next batch."""
+        if not st.st_ino:
+            return
+        with self._lock:
+            self._pending.append((st.st_dev, st.st_ino, algorithm, st.st_size,
+                                  st.st_mtime_ns, digest, path, int(time.time())))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write queued digests and access times, then enforce the size cap."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending and not self._touched:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+            self._db.executemany(
+                "UPDATE hashes SET used=? WHERE dev=? AND ino=? AND algo=?", self._touched)
+        inserted = bool(self._pending)
+        self._pending, self._touched = [], []
+        if inserted:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        count = self._db.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        if count > self.max_entries:
+            with self._db:
+                self._db.execute(
+                    "DELETE FROM hashes WHERE rowid IN "
+                    "(SELECT rowid FROM hashes ORDER BY used LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def prune(self):
+        """Drop rows whose path no longer exists or now holds another file."""
+        stale = []
+        with self._lock:
+            self._flush_locked()
+            rows = self._db.execute("SELECT rowid, path, dev, ino FROM hashes").fetchall()
+        for rowid, path, dev, ino in rows:
+            try:
+                st = os.stat(path)
+                if (st.st_dev, st.st_ino) == (dev, ino):
+                    continue
+            except OSError:
+                pass
+            stale.append((rowid,))
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM hashes WHERE rowid=?", stale)
+        return len(stale)
+
+    def close(self):
+        """Flush pending writes and close the database."""
+        with self._lock:
+            self._flush_locked()
+            self._db.close()
+
+
+class XattrHashStore:
+    """Hash cache backend that stamps digests onto the files themselves.
+
+    Drop-in alternative to HashCache; lookups miss where xattrs are unsupported.
+    """
+
+    PREFIX = 'user.organizer.'
+
+    def __init__(self):
+        self.supported = hasattr(os, 'setxattr')
+        self._unsupported_devs = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _usable(self, st):
+        return self.supported and st.st_dev not in self._unsupported_devs
+
+    def _disable_on(self, st, error):
+        if error.errno in (errno.ENOTSUP, errno.EOPNOTSUPP):
+            self._unsupported_devs.add(st.st_dev)
+
+    def get(self, path, st, algorithm):
+        """Return the stamped digest if it was computed for the current content."""
+        if not self._usable(st):
+            return None
+        try:
+            value = os.getxattr(path, self.PREFIX + algorithm).decode('ascii')
+        except OSError as e:
+            self._disable_on(st, e)
+            return None
+        except UnicodeDecodeError:
+            return None
+        mtime_ns, size, digest = (value.split(' ') + [None, None])[:3]
+        if mtime_ns != str(st.st_mtime_ns) or size != str(st.st_size) or not digest:
+            return None
+        return digest
+
+    def put(self, path, st, algorithm, digest):
+        """Stamp digest onto path; failures (read-only, no xattrs) are ignored."""
+        if not self._usable(st):
+            return
+        value = f"{st.st_mtime_ns} {st.st_size} {digest}".encode('ascii')
+        try:
+            os.setxattr(path, self.PREFIX + algorithm, value)
+        except OSError as e:
+            self._disable_on(st, e)
+
+    def flush(self):
+        """Stamps are written immediately; present for HashCache parity."""
+
+    def prune(self):
+        """Stamps vanish with their files, so there is never anything to prune."""
+        return 0
+
+    def close(self):
+        """Nothing to release; present for HashCache parity."""
+
+
+class PathTable:
+    """Compact, append-only store of file paths addressed by integer id.
+
+    Directories are interned once; each file costs a directory id, an end
+    offset into a shared names blob and its encoded name, instead of a
+    full str object. Paths come back exactly as they were added.
+    """
+
+    def __init__(self):
+        self.dirs = []
+        self._dir_ids = {}
+        self._dir_of = array('I')
+        self._ends = array('Q')
+        self._names = bytearray()
+
+    def __len__(self):
+        return len(self._ends)
+
+    def add(self, path):
+        """Store path and return its id."""
+        head, sep, name = path.rpartition(os.sep)
+        head += sep
+        dir_id = self._dir_ids.get(head)
+        if dir_id is None:
+            dir_id = self._dir_ids[head] = len(self.dirs)
+            self.dirs.append(head)
+        self._dir_of.append(dir_id)
+        self._names += os.fsencode(name)
+        self._ends.append(len(self._names))
+        return len(self._ends) - 1
+
+    def __getitem__(self, file_id):
+        start = self._ends[file_id - 1] if file_id else 0
+        name = os.fsdecode(bytes(self._names[start:self._ends[file_id]]))
+        return self.dirs[self._dir_of[file_id]] + name
+
+
+class _GroupItems(ItemsView):
+    """items() of a GroupIndex, walking the packed groups in order."""
+
+    def __iter__(self):
+        index = self._mapping
+        for i in range(len(index)):
+            yield index._key(i), index._paths(i)
+
+
+class GroupIndex(Mapping):
+    """Read-only {key: [paths]} view over groups of PathTable ids.
+
+    Keys are packed into one buffer of fixed-width records and members
+    into an id array, so a group costs a few bytes plus four per member;
+    path lists are only built when a group is looked at.
+    """
+
+    def __init__(self, paths, key_size, pack, unpack):
+        self.paths = paths
+        self.key_size = key_size
+        self._pack = pack
+        self._unpack = unpack
+        self._keys = bytearray()
+        self._ends = array('Q')
+        self._members = array('I')
+        self._lookup = None
+
+    def add(self, raw_key, ids):
+        """Append a group under an already packed key."""
+        self._keys += raw_key
+        self._members.extend(ids)
+        self._ends.append(len(self._members))
+        self._lookup = None
+
+    def _ids(self, i):
+        return self._members[self._ends[i - 1] if i else 0:self._ends[i]]
+
+    def _raw(self, i):
+        return bytes(self._keys[i * self.key_size:(i + 1) * self.key_size])
+
+    def _key(self, i):
+        return self._unpack(self._raw(i))
+
+    def _paths(self, i):
+        return [self.paths[file_id] for file_id in self._ids(i)]
+
+    def _index(self, key):
+        if self._lookup is None:
+            self._lookup = {self._raw(i): i for i in range(len(self))}
+        try:
+            return self._lookup[self._pack(key)]
+        except (KeyError, TypeError, ValueError, struct.error):
+            raise KeyError(key) from None
+
+    def __getitem__(self, key):
+        return self._paths(self._index(key))
+
+    def __iter__(self):
+        return (self._key(i) for i in range(len(self)))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def items(self):
+        return _GroupItems(self)
+
+
+class DuplicateGroups(GroupIndex):
+    """find_duplicates result: {hex digest: [paths]} plus hardlink and size info.
+
+    hardlinks maps (st_dev, st_ino) to names sharing that inode; probable
+    holds digests from a quick pass that are not yet confirmed.
+    """
+
+    def __init__(self, paths, digest_size):
+        super().__init__(paths, digest_size, bytes.fromhex, bytes.hex)
+        self.hardlinks = GroupIndex(paths, 16, lambda key: struct.pack('QQ', *key),
+                                    lambda raw: struct.unpack('QQ', raw))
+        self._sizes = array('Q')
+        self._probable = bytearray()
+        self._inodes = array('Q')
+        self._mtimes = array('q')
+
+    def stamp(self, file_id, st):
+        """Record the scan-time stat of a file; ids must be stamped in order."""
+        self._inodes.append(st.st_ino)
+        self._mtimes.append(st.st_mtime_ns)
+
+    def add(self, raw_key, ids, size=0, probable=False):
+        """Append a group of same-content files under a raw digest."""
+        super().add(raw_key, ids)
+        self._sizes.append(size)
+        self._probable.append(probable)
+
+    @property
+    def probable(self):
+        return {self._key(i) for i, flag in enumerate(self._probable) if flag}
+
+    def size(self, digest):
+        """Size in bytes of each file in a group."""
+        return self._sizes[self._index(digest)]
+
+    def stamps(self, digest):
+        """(st_ino, st_mtime_ns) at scan time for each path of a group."""
+        return [(self._inodes[file_id], self._mtimes[file_id])
+                for file_id in self._ids(self._index(digest))]
+
+    def reclaimable_bytes(self, digest=None):
+        """Bytes freed by keeping one copy of a group, or of every group."""
+        groups = range(len(self)) if digest is None else (self._index(digest),)
+        return sum((self._ends[i] - (self._ends[i - 1] if i else 0) - 1) * self._sizes[i]
+                   for i in groups)
+
+
+class PathSpool:
+    """Append-only file of paths, addressed by their byte offset.
+
+    The disk-backed counterpart of PathTable for scans too large to keep
+    every path in memory. Add every path, then flush() before reading back.
+    """
+
+    def __init__(self, directory):
+        self._file = open(os.path.join(directory, 'paths'), 'w+b')
+        self._end = 0
+
+    def add(self, path):
+        """Store path and return its id (its offset in the spool)."""
+        encoded = os.fsencode(path)
+        offset = self._end
+        self._file.write(struct.pack('<I', len(encoded)) + encoded)
+        self._end += 4 + len(encoded)
+        return offset
+
+    def flush(self):
+        self._file.flush()
+
+    def __getitem__(self, offset):
+        self._file.seek(offset)
+        length, = struct.unpack('<I', self._file.read(4))
+        return os.fsdecode(self._file.read(length))
+
+    def close(self):
+        self._file.close()
+
+
+class ExternalSorter:
+    """Sort fixed-width records in bounded memory using run files on disk.
+
+    Records are packed big-endian, so byte order is numeric order. Up to
+    memory_limit bytes are buffered and sorted in memory, then written out
+    as a sorted run; iterating merges the runs with heapq.merge, a few at a
+    time if there are more than MERGE_FANIN.
+    """
+
+    MERGE_FANIN = 64
+
+    def __init__(self, fmt, directory, memory_limit):
+        self.record = struct.Struct('>' + fmt)
+        self.directory = directory
+        self.memory_limit = memory_limit
+        # A sorted run briefly holds the buffer plus one bytes object per record
+        self.capacity = max(1, memory_limit // (2 * self.record.size + 64))
+        self._buffer = bytearray()
+        self._count = 0
+        self._runs = []
+
+    def add(self, *values):
+        self._buffer += self.record.pack(*values)
+        self._count += 1
+        if self._count >= self.capacity:
+            self._spill()
+
+    def _spill(self):
+        if not self._count:
+            return
+        size = self.record.size
+        records = sorted(bytes(self._buffer[i:i + size])
+                         for i in range(0, len(self._buffer), size))
+        self._buffer = bytearray()
+        self._count = 0
+        self._write_run(records)
+
+    def _write_run(self, records):
+        fd, path = tempfile.mkstemp(prefix='run', dir=self.directory)
+        with open(fd, 'wb') as f:
+            f.writelines(records)
+        self._runs.append(path)
+
+    def _read_run(self, path):
+        size = self.record.size
+        chunk = size * max(1, self.memory_limit // (4 * self.MERGE_FANIN * size))
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(chunk)
+                    if not block:
+                        break
+                    for i in range(0, len(block), size):
+                        yield block[i:i + size]
+        finally:
+            os.unlink(path)
+
+    def __iter__(self):
+        """Yield every record in sorted order as a tuple; the sorter is consumed."""
+        self._spill()
+        while len(self._runs) > self.MERGE_FANIN:
+            batch, self._runs = self._runs[:self.MERGE_FANIN], self._runs[self.MERGE_FANIN:]
+            self._write_run(heapq.merge(*map(self._read_run, batch)))
+        runs, self._runs = self._runs, []
+        for raw in heapq.merge(*map(self._read_run, runs)):
+            yield self.record.unpack(raw)
+
+
+class DestinationIndex:
+    """Names in use in destination directories, listed once per session.
+
+    Each directory is listed on first use (through dir_fd if given) and
+    every file_N run remembers its members' sizes and fingerprints.
+    """
+
+    def __init__(self):
+        self._names = {}
+        self._next = {}
+        self._keys = {}
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _run(self, key, names, filename):
+        """[unsized names, {size: unhashed names}, {(size, digest): names}] of a run."""
+        base, ext = os.path.splitext(filename)
+        runs = self._runs.setdefault(key, {})
+        run = runs.get((base, ext))
+        if run is None:
+            taken = set()
+            name, counter = filename, 1
+            while os.path.normcase(name) in names:
+                taken.add(name)
+                name = f"{base}_{counter}{ext}"
+                counter += 1
+            run = runs[(base, ext)] = [taken, defaultdict(set), defaultdict(list)]
+        return run
+
+    def matching(self, directory, filename, size, digest, fingerprint, dir_fd=None):
+        """Names in the filename run of this size whose fingerprint is digest.
+
+        fingerprint(name) is called outside the lock, at most once per
+        occupant and only for occupants of the same size; None drops it.
+        """
+        with self._lock:
+            key, names = self._listing(directory, dir_fd)
+            unsized, unhashed, hashed = self._run(key, names, filename)
+            pending = list(unsized)
+        found = []
+        for name in pending:
+            try:
+                found.append((name, os.stat(name if dir_fd is not None else
+                                            os.path.join(directory, name), dir_fd=dir_fd)))
+            except OSError:
+                found.append((name, None))
+        with self._lock:
+            for name, st in found:
+                if name in unsized:
+                    unsized.discard(name)
+                    if st is not None:
+                        unhashed[st.st_size].add(name)
+            pending = list(unhashed.get(size, ()))
+        found = [(name, fingerprint(name)) for name in pending]
+        with self._lock:
+            for name, value in found:
+                if name in unhashed.get(size, ()):
+                    unhashed[size].discard(name)
+                    if value is not None:
+                        hashed[(size, value)].append(name)
+            return list(hashed.get((size, digest), ()))
+
+    def record(self, directory, filename, name, size, digest=None):
+        """Note that name, of this size and fingerprint, now holds a placed file."""
+        with self._lock:
+            runs = self._runs.get(self._keys.get(directory))
+            run = runs and runs.get(os.path.splitext(filename))
+            if run is None:
+                return
+            run[0].discard(name)
+            if digest is None:
+                run[1][size].add(name)
+            else:
+                run[2][(size, digest)].append(name)
+
+    def _listing(self, directory, dir_fd=None):
+        key = self._keys.get(directory)
+        if key is None:
+            key = self._keys[directory] = os.path.normcase(os.path.abspath(directory))
+        names = self._names.get(key)
+        if names is None:
+            try:
+                names = {os.path.normcase(name)
+                         for name in os.listdir(directory if dir_fd is None else dir_fd)}
+            except FileNotFoundError:
+                names = set()
+            self._names[key] = names
+        return key, names
+
+    def claim(self, directory, filename, dir_fd=None):
+        """Reserve and return the first free name among filename, file_1, ..."""
+        base, ext = os.path.splitext(filename)
+        with self._lock:
+            key, names = self._listing(directory, dir_fd)
+            name = filename
+            if os.path.normcase(name) in names:
+                counter = self._next.get((key, base, ext), 1)
+                while os.path.normcase(f"{base}_{counter}{ext}") in names:
+                    counter += 1
+                self._next[(key, base, ext)] = counter + 1
+                name = f"{base}_{counter}{ext}"
+            names.add(os.path.normcase(name))
+            run = self._runs.get(key, {}).get((base, ext))
+            if run is not None:
+                run[0].add(name)
+            return name
+
+    def release(self, directory, name):
+        """Forget a claimed name that was never written."""
+        with self._lock:
+            key, names = self._listing(directory)
+            names.discard(os.path.normcase(name))
+            for run in self._runs.get(key, {}).values():
+                run[0].discard(name)
+
+
+class DirectoryHandles:
+    """Cache of open directory descriptors for *at() style file operations.
+
+    SUPPORTED is False where dir_fd is unavailable (Windows).
+    """
+
+    SUPPORTED = ({os.open, os.stat, os.link, os.unlink, os.rename, os.utime, os.chmod}
+                 <= os.supports_dir_fd and hasattr(os, 'O_DIRECTORY'))
+
+    def __init__(self, max_open=256):
+        self.max_open = max_open
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, directory):
+        """Yield a descriptor for directory, opening it on first use.
+
+        Handles are keyed by the path as given; relative paths resolve
+        against the working directory at first use.
+        """
+        with self._lock:
+            handle = self._handles.get(directory)
+            if handle is None:
+                fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY | getattr(os, 'O_CLOEXEC', 0))
+                handle = self._handles[directory] = [fd, 0]
+            self._handles.move_to_end(directory)
+            handle[1] += 1
+        try:
+            yield handle[0]
+        finally:
+            with self._lock:
+                handle[1] -= 1
+                if len(self._handles) > self.max_open:
+                    self._trim_locked()
+
+    def _trim_locked(self):
+        idle = [key for key, (_, users) in self._handles.items() if not users]
+        for key in idle[:len(self._handles) - self.max_open]:
+            os.close(self._handles.pop(key)[0])
+
+    def close(self):
+        with self._lock:
+            for fd, _ in self._handles.values():
+                os.close(fd)
+            self._handles.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CacheDropper:
+    """Reads a file and evicts from the page cache only what it read in.
+
+    Pages already cached are left alone; call flush() at the end.
+    """
+
+    def __init__(self, f, window=8 * 1024 * 1024):
+        self._f = f
+        self._fd = f.fileno()
+        self.window = window
+        self.probing = hasattr(os, 'RWF_NOWAIT') and hasattr(os, 'posix_fadvise')
+        self._start = self._end = 0
+        if self.probing:
+            OrganizerCore._fadvise(self._fd, 0, 0, 'POSIX_FADV_RANDOM')
+
+    def _pread(self, view, offset):
+        if hasattr(os, 'preadv'):
+            return os.preadv(self._fd, [view], offset)
+        self._f.seek(offset)
+        return self._f.readinto(view)
+
+    def readinto(self, view, offset):
+        """Read into view from offset like pread; returns the byte count."""
+        cached = 0
+        if self.probing:
+            try:
+                cached = os.preadv(self._fd, [view], offset, os.RWF_NOWAIT)
+            except BlockingIOError:
+                pass
+            except OSError:
+                # RWF_NOWAIT unsupported here: stop dropping, keep reading
+                self.probing = False
+                self._start = self._end
+            if cached == len(view):
+                return cached
+        n = self._pread(view[cached:], offset + cached)
+        if self.probing and n:
+            start = offset + cached
+            if start != self._end:
+                self.flush()
+                self._start = start
+            self._end = start + n
+            if self._end - self._start >= self.window:
+                self.flush()
+        return cached + n
+
+    def flush(self):
+        """Drop the pending range this reader loaded."""
+        if self._end > self._start:
+            OrganizerCore._fadvise(self._fd, self._start, self._end - self._start,
+                                   'POSIX_FADV_DONTNEED')
+        self._start = self._end
+
 
 class OrganizerCore:
     """Independent logic for file organization and duplicate detection"""
     
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+    MMAP_THRESHOLD = 64 * 1024 * 1024
+    MMAP_SLICE = 16 * 1024 * 1024
+    DROP_WINDOW = 8 * 1024 * 1024
+    SPARSE_BLOCK = 4096
+    HASH_ALGORITHMS = ('md5', 'sha1', 'sha256', 'blake2b', 'blake2b-256', 'blake2b-128')
+
+    _buffers = threading.local()
+
+    @staticmethod
+    def new_hasher(algorithm='md5'):
+        """Create a hashlib object; 'blake2b-<bits>' selects the digest size."""
+        name, _, bits = algorithm.partition('-')
+        if name == 'blake2b':
+            return hashlib.blake2b(digest_size=int(bits) // 8 if bits else 64)
+        if name in ('md5', 'sha1', 'sha256') and not bits:
+            return hashlib.new(name)
+        raise ValueError(f"Unsupported hash algorithm: {algorithm}")
+
+    @staticmethod
+    def _read_buffer(size):
+        """Return a per-thread reusable memoryview of at least size bytes."""
+        buf = getattr(OrganizerCore._buffers, 'buf', None)
+        if buf is None or len(buf) < size:
+            buf = memoryview(bytearray(size))
+            OrganizerCore._buffers.buf = buf
+        return buf[:size]
+
     @staticmethod
-    def get_file_hash(filepath, chunk_size=8192):
-        """Calculate MD5 hash of a file using chunks to support large files."""
-        hasher = hashlib.md5()
+    def get_file_hash(filepath, chunk_size=DEFAULT_CHUNK_SIZE, sniffer=None, cache=None,
+                      algorithm='md5', use_mmap=True, drop_cache=False, sparse=False,
+                      dir_fd=None):
+        """Calculate a file digest in chunks to support large files.
+
+        algorithm is one of HASH_ALGORITHMS; cache and sniffer are optional.
+        drop_cache evicts the pages the hash read in, sparse=True returns
+        get_sparse_hash, and dir_fd makes filepath relative to it.
+        """
+        cache_key = f'{algorithm}+sparse' if sparse else algorithm
+        hasher = OrganizerCore.new_hasher(algorithm)
         try:
-            with open(filepath, 'rb') as f:
-                while chunk := f.read(chunk_size):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
+            if cache is not None:
+                digest = cache.get(filepath, os.stat(filepath, dir_fd=dir_fd), cache_key)
+                if digest:
+                    return digest
+            with open(filepath, 'rb', buffering=0, opener=OrganizerCore._opener(dir_fd)) as f:
+                st = os.fstat(f.fileno())
+                dropper = CacheDropper(f, OrganizerCore.DROP_WINDOW) if drop_cache else None
+                if sparse:
+                    digest = OrganizerCore._hash_sparse(f, st, algorithm, chunk_size, dropper)
+                    if cache is not None:
+                        cache.put(filepath, st, cache_key, digest)
+                    return digest
+                if not (use_mmap and not drop_cache and
+                        OrganizerCore._hash_mmap(f, st, hasher, filepath, sniffer)):
+                    view = OrganizerCore._read_buffer(chunk_size)
+                    read = dropper.readinto if drop_cache else lambda view, _: f.readinto(view)
+                    n = read(view, 0)
+                    if sniffer is not None and not sniffer.lookup(filepath, st)[0]:
+                        sniffer.record(filepath, st, view[:n])
+                    offset = 0
+                    while n:
+                        hasher.update(view[:n])
+                        offset += n
+                        n = read(view, offset)
+                    if drop_cache:
+                        dropper.flush()
+            digest = hasher.hexdigest()
+            if cache is not None:
+                cache.put(filepath, st, algorithm, digest)
+            return digest
         except (PermissionError, IOError):
             return None
 
+    @staticmethod
+    def get_sparse_hash(filepath, algorithm='md5', chunk_size=DEFAULT_CHUNK_SIZE, cache=None):
+        """Hole-aware digest that reads only the data extents of a sparse file.
+
+        Not comparable with get_file_hash.
+        """
+        return OrganizerCore.get_file_hash(filepath, chunk_size, cache=cache,
+                                           algorithm=algorithm, sparse=True)
+
+    @staticmethod
+    def _data_extents(fd, size):
+        """Yield (start, stop) data ranges, or the whole file without SEEK_DATA."""
+        seek_data = getattr(os, 'SEEK_DATA', None)
+        seek_hole = getattr(os, 'SEEK_HOLE', None)
+        if seek_data is None:
+            yield 0, size
+            return
+        pos = 0
+        while pos < size:
+            try:
+                start = os.lseek(fd, pos, seek_data)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    return
+                # Filesystem cannot report extents: treat the rest as data
+                yield pos, size
+                return
+            try:
+                stop = os.lseek(fd, start, seek_hole)
+            except OSError:
+                stop = size
+            yield start, min(stop, size)
+            pos = stop
+
+    @staticmethod
+    def _hash_sparse(f, st, algorithm, chunk_size, dropper=None):
+        """Compute the canonical sparse digest for an open file (see get_sparse_hash).
+
+        Reads go through dropper, a CacheDropper, when one is given.
+        """
+        block = OrganizerCore.SPARSE_BLOCK
+        chunk_size = max(block, chunk_size - chunk_size % block)
+        zero_block = bytes(block)
+        content = OrganizerCore.new_hasher(algorithm)
+        layout = OrganizerCore.new_hasher(algorithm)
+        size = st.st_size
+        fd = f.fileno()
+        view = OrganizerCore._read_buffer(chunk_size)
+        buf = view.obj
+        run = []
+
+        def zeros(start, stop):
+            if run:
+                run[1] = stop
+            else:
+                run[:] = [start, stop]
+
+        def data(lo, hi):
+            if run:
+                layout.update(struct.pack('<QQ', run[0], run[1] - run[0]))
+                run.clear()
+            content.update(view[lo:hi])
+
+        def read_at(pos, want):
+            got = 0
+            while got < want:
+                if dropper is not None:
+                    n = dropper.readinto(view[got:want], pos + got)
+                elif hasattr(os, 'preadv'):
+                    n = os.preadv(fd, [view[got:want]], pos + got)
+                else:
+                    f.seek(pos + got)
+                    n = f.readinto(view[got:want])
+                if not n:
+                    break
+                got += n
+            return got
+
+        covered = 0
+        for start, stop in OrganizerCore._data_extents(fd, size):
+            # Widen to whole blocks; hole bytes read back as zeros
+            start = max(covered, start - start % block)
+            stop = min(size, stop + (-stop) % block)
+            if start >= stop:
+                continue
+            if start > covered:
+                zeros(covered, start)
+
+            pos = start
+            while pos < stop:
+                n = read_at(pos, min(chunk_size, stop - pos))
+                if not n:
+                    break
+                if buf.count(0, 0, n) == n:
+                    zeros(pos, pos + n)
+                    pos += n
+                    continue
+
+                # Fold every aligned all-zero block; pos is always block aligned
+                pending = scan = 0
+                while scan < n:
+                    i = buf.find(zero_block, scan, n)
+                    if i == -1:
+                        break
+                    a = i + (-i) % block
+                    if a + block > n:
+                        break
+                    if buf.startswith(zero_block, a):
+                        if a > pending:
+                            data(pending, a)
+                        zeros(pos + a, pos + a + block)
+                        pending = a + block
+                    scan = a + block
+
+                last = n - n % block
+                if n % block and last >= pending and buf.count(0, last, n) == n - last:
+                    # Short final block of the file
+                    if last > pending:
+                        data(pending, last)
+                    zeros(pos + last, pos + n)
+                elif pending < n:
+                    data(pending, n)
+                pos += n
+
+            covered = max(covered, pos)
+            if dropper is not None:
+                dropper.flush()
+
+        if covered < size:
+            zeros(covered, size)
+        if run:
+            layout.update(struct.pack('<QQ', run[0], run[1] - run[0]))
+
+        final = OrganizerCore.new_hasher(algorithm)
+        final.update(content.digest())
+        final.update(layout.digest())
+        final.update(struct.pack('<Q', size))
+        return final.hexdigest()
+
+    @staticmethod
+    def _opener(dir_fd):
+        """open() opener resolving names relative to dir_fd; None for plain paths."""
+        if dir_fd is None:
+            return None
+        return lambda path, flags: os.open(path, flags, dir_fd=dir_fd)
+
+    @staticmethod
+    def _fadvise(fd, offset, length, advice):
+        """posix_fadvise that quietly does nothing where it is unsupported."""
+        advice = getattr(os, advice, None)
+        if advice is None or not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _hash_mmap(f, st, hasher, filepath=None, sniffer=None):
+        """Feed a large regular file to hasher via mmap; False if not applicable."""
+        if not stat_module.S_ISREG(st.st_mode) or st.st_size < OrganizerCore.MMAP_THRESHOLD:
+            return False
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        with mm, memoryview(mm) as view:
+            if sniffer is not None and not sniffer.lookup(filepath, st)[0]:
+                sniffer.record(filepath, st, view[:ContentSniffer.HEADER_SIZE])
+            step = OrganizerCore.MMAP_SLICE
+            for offset in range(0, len(view), step):
+                hasher.update(view[offset:offset + step])
+        return True
+
+    @staticmethod
+    def benchmark_hashing(path=None, size_mb=256, algorithms=HASH_ALGORITHMS,
+                          chunk_sizes=(64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024)):
+        """Measure hashing throughput for each algorithm and read method.
+
+        Hashes path, or a temporary file of size_mb random megabytes, and
+        returns a list of result dicts with MB/s.
+        """
+        temp_path = None
+        if path is None:
+            fd, temp_path = tempfile.mkstemp(prefix='organizer-bench-')
+            block = os.urandom(1024 * 1024)
+            with os.fdopen(fd, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+            path = temp_path
+
+        def timed(**kwargs):
+            start = time.perf_counter()
+            OrganizerCore.get_file_hash(path, **kwargs)
+            return size / max(time.perf_counter() - start, 1e-9) / (1024 * 1024)
+
+        try:
+            size = os.path.getsize(path)
+            OrganizerCore.get_file_hash(path)
+            results = []
+            for algorithm in algorithms:
+                for chunk_size in chunk_sizes:
+                    results.append({'algorithm': algorithm, 'method': 'read',
+                                    'chunk_size': chunk_size,
+                                    'mb_per_s': timed(chunk_size=chunk_size, algorithm=algorithm,
+                                                      use_mmap=False)})
+                if size >= OrganizerCore.MMAP_THRESHOLD:
+                    results.append({'algorithm': algorithm, 'method': 'mmap',
+                                    'chunk_size': OrganizerCore.MMAP_SLICE,
+                                    'mb_per_s': timed(algorithm=algorithm, use_mmap=True)})
+            return results
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    @staticmethod
+    def _page_cache_kb():
+        """System-wide page cache size in KiB from /proc/meminfo (Linux only)."""
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('Cached:'):
+                    return int(line.split()[1])
+        raise OSError("Cached: not reported by /proc/meminfo")
+
+    @staticmethod
+    def measure_cache_residency(path=None, size_mb=512, interval=0.05):
+        """Sample page-cache growth while hashing with and without drop_cache.
+
+        The file (a temporary one of size_mb megabytes by default) is evicted
+        before each run, then hashed on a worker thread while the page cache
+        size is polled. Returns one dict per mode with the peak and final
+        growth in MB; with drop_cache the curve should stay flat.
+        """
+        temp_path = None
+        if path is None:
+            fd, temp_path = tempfile.mkstemp(prefix='organizer-bench-')
+            block = os.urandom(1024 * 1024)
+            with os.fdopen(fd, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+            path = temp_path
+
+        try:
+            results = []
+            for drop_cache in (False, True):
+                with open(path, 'rb') as f:
+                    OrganizerCore._fadvise(f.fileno(), 0, 0, 'POSIX_FADV_DONTNEED')
+                baseline = OrganizerCore._page_cache_kb()
+                worker = threading.Thread(target=OrganizerCore.get_file_hash, args=(path,),
+                                          kwargs={'drop_cache': drop_cache})
+                samples = [0]
+                worker.start()
+                while worker.is_alive():
+                    samples.append(OrganizerCore._page_cache_kb() - baseline)
+                    time.sleep(interval)
+                worker.join()
+                final = OrganizerCore._page_cache_kb() - baseline
+                results.append({'drop_cache': drop_cache, 'peak_mb': max(samples) / 1024,
+                                'final_mb': final / 1024})
+            return results
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+
+    @staticmethod
+    def scan_folder(folder, recursive=False, max_depth=None, follow_symlinks=False, ignore=None):
+        """Yield a FileEntry for every regular file in folder as it is listed.
+
+        Uses os.scandir so the file type comes from d_type and each entry is
+        stat'ed exactly once; entries that vanish mid-scan are skipped. With
+        recursive=True the whole tree is streamed through OrganizerCore.walk.
+        """
+        return OrganizerCore.walk(folder, max_depth if recursive else 0, follow_symlinks, ignore)
+
+    @staticmethod
+    def walk(folder, max_depth=None, follow_symlinks=False, ignore=None):
+        """Depth-first generator over the regular files below folder.
+
+        max_depth=0 lists folder alone and None means unlimited; ignore is an
+        optional IgnoreRules. Unreadable subdirectories are skipped.
+        """
+        visited = set()
+        if follow_symlinks:
+            st = os.stat(folder)
+            visited.add((st.st_dev, st.st_ino))
+
+        stack = [(folder, '', 0)]
+        while stack:
+            path, rel, depth = stack.pop()
+            try:
+                it = os.scandir(path)
+            except OSError:
+                if depth == 0:
+                    raise
+                continue
+
+            subdirs = []
+            with it:
+                for entry in it:
+                    name = entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if max_depth is not None and depth >= max_depth:
+                                continue
+                            entry_rel = f"{rel}/{name}" if rel else name
+                            if ignore is not None and ignore.matches(entry_rel, name, True):
+                                continue
+                            if follow_symlinks:
+                                st = entry.stat()
+                                key = (st.st_dev, st.st_ino)
+                                if key in visited:
+                                    continue
+                                visited.add(key)
+                            subdirs.append((entry.path, entry_rel))
+                            continue
+                        if ignore is not None and ignore.matches(
+                                f"{rel}/{name}" if rel else name, name, False):
+                            continue
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    yield FileEntry(name, entry.path, st)
+
+            # Reversed so siblings are visited in listing order
+            stack.extend((d, r, depth + 1) for d, r in reversed(subdirs))
+
     @staticmethod
     def format_size(size):
         """Format bytes to human-readable string."""
@@ -30,51 +1455,1231 @@ class OrganizerCore:
             size /= 1024.0
         return f"{size:.1f} PB"
 
+    _rules_memo = (None, None)
+
     @staticmethod
-    def get_destination(filename, categories):
-        """Determine folder name based on extension and categories."""
-        ext = Path(filename).suffix.lower()
-        for category, extensions in categories.items():
-            if ext in extensions:
-                return category
-        return "Others"
+    def get_destination(filename, categories, size=None, mtime=None):
+        """Determine folder name based on extension and categories.
+
+        Pass a CategoryRules instance to reuse the compiled index across
+        calls. A plain categories dict is compiled once and reused while
+        later calls pass the same contents in the same order.
+        """
+        if not isinstance(categories, CategoryRules):
+            source, rules = OrganizerCore._rules_memo
+            if rules is None or source != list(categories.items()):
+                rules = CategoryRules(categories)
+                OrganizerCore._rules_memo = (copy.deepcopy(list(categories.items())), rules)
+            categories = rules
+        return categories.classify(filename, size, mtime)
+
+    @staticmethod
+    def classify_entry(entry, rules, sniffer=None, sniff_all=False):
+        """Categorise a FileEntry, sniffing content for unknown extensions.
+
+        With sniff_all=True every file is sniffed so mislabeled files are
+        caught too; otherwise only extensions the rules do not know are.
+        """
+        ext = os.path.splitext(entry.name)[1].lower()
+        if sniffer is not None:
+            if not rules.knows(ext):
+                ext = sniffer.sniff(entry.path, entry.stat) or ext
+            elif sniff_all:
+                sniffed = sniffer.sniff(entry.path, entry.stat)
+                if ContentSniffer.is_mislabeled(ext, sniffed):
+                    ext = sniffed
+        return rules.classify(entry.name, entry.size, entry.mtime, ext)
+
+    PARTIAL_SAMPLE = 64 * 1024
+    QUICK_SAMPLES = 8
 
     @staticmethod
-    def find_duplicates(file_paths, progress_callback=None):
-        """Find duplicate files based on content hash."""
-        hash_map = defaultdict(list)
+    def get_partial_hash(filepath, size, sample_size=PARTIAL_SAMPLE, sniffer=None, cache=None,
+                         algorithm='md5', drop_cache=False, samples=2, dir_fd=None):
+        """Hash only samples blocks of sample_size bytes spread across a file.
+
+        The default two samples are the head and tail; small files are hashed
+        whole. dir_fd works as in get_file_hash.
+        """
+        if size <= samples * sample_size:
+            return OrganizerCore.get_file_hash(filepath, sniffer=sniffer, cache=cache,
+                                               algorithm=algorithm, drop_cache=drop_cache,
+                                               dir_fd=dir_fd)
+        cache_key = OrganizerCore._hash_algorithm(size, samples, algorithm, sample_size)
+        hasher = OrganizerCore.new_hasher(algorithm)
+        if samples > 2:
+            hasher.update(size.to_bytes(8, 'little'))
+        span = size - sample_size
+        offsets = [span * i // (samples - 1) for i in range(samples)]
+        try:
+            if cache is not None:
+                digest = cache.get(filepath, os.stat(filepath, dir_fd=dir_fd), cache_key)
+                if digest:
+                    return digest
+            view = OrganizerCore._read_buffer(sample_size)
+            with open(filepath, 'rb', buffering=0, opener=OrganizerCore._opener(dir_fd)) as f:
+                st = os.fstat(f.fileno())
+                dropper = CacheDropper(f, OrganizerCore.DROP_WINDOW) if drop_cache else None
+                for offset in offsets:
+                    if dropper is not None:
+                        n = dropper.readinto(view, offset)
+                    else:
+                        f.seek(offset)
+                        n = f.readinto(view)
+                    if offset == 0 and sniffer is not None and not sniffer.lookup(filepath, st)[0]:
+                        sniffer.record(filepath, st, view[:n])
+                    hasher.update(view[:n])
+                if dropper is not None:
+                    dropper.flush()
+            digest = hasher.hexdigest()
+            if cache is not None:
+                cache.put(filepath, st, cache_key, digest)
+            return digest
+        except (PermissionError, IOError):
+            return None
+
+    SMALL_FILE = 16 * 1024
+    SMALL_BATCH = 64 * 1024 * 1024
+
+    @staticmethod
+    def read_small(filepath, sniffer=None, drop_cache=False, dir_fd=None):
+        """Read a small file whole, for byte comparison instead of hashing."""
+        try:
+            with open(filepath, 'rb', buffering=0, opener=OrganizerCore._opener(dir_fd)) as f:
+                if drop_cache:
+                    dropper = CacheDropper(f)
+                    buf = bytearray(os.fstat(f.fileno()).st_size + 1)
+                    got = 0
+                    while True:
+                        n = dropper.readinto(memoryview(buf)[got:], got)
+                        if not n:
+                            break
+                        got += n
+                        if got == len(buf):
+                            buf.extend(bytes(len(buf)))
+                    dropper.flush()
+                    data = bytes(buf[:got])
+                else:
+                    data = f.readall()
+                if sniffer is not None:
+                    st = os.fstat(f.fileno())
+                    if not sniffer.lookup(filepath, st)[0]:
+                        sniffer.record(filepath, st, data)
+            return data
+        except (PermissionError, IOError):
+            return None
+
+    @staticmethod
+    def _parallel_map(func, items, workers=1, use_processes=False):
+        """Yield (item, func(item)) pairs as they complete.
+
+        At most a few tasks per worker are in flight, so huge task lists are
+        consumed lazily. Results are yielded in the calling thread.
+        """
+        if workers <= 1:
+            for item in items:
+                yield item, func(item)
+            return
+
+        executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        items = iter(items)
+        with executor(max_workers=workers) as pool:
+            pending = {pool.submit(func, item): item
+                       for item in itertools.islice(items, workers * 4)}
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    item = pending.pop(future)
+                    for nxt in itertools.islice(items, 1):
+                        pending[pool.submit(func, nxt)] = nxt
+                    yield item, future.result()
+
+    @staticmethod
+    def _hash_algorithm(size, samples, algorithm='md5', sample_size=PARTIAL_SAMPLE, sparse=False):
+        """Cache key naming the digest a hashing task produces."""
+        if samples == 2 and size > 2 * sample_size:
+            return f'{algorithm}:partial{sample_size}'
+        if samples and size > samples * sample_size:
+            return f'{algorithm}:sampled{samples}x{sample_size}'
+        if sparse and not samples:
+            return f'{algorithm}+sparse'
+        return algorithm
+
+    @staticmethod
+    def _hash_stage(tasks, workers=1, use_processes=False, sniffer=None, cache=None,
+                    options=None):
+        """Hash (path, size, samples, ...) tasks, yielding (task, digest) pairs.
+
+        samples is 0 for a full hash; extra task fields are carried through.
+        options holds extra keyword arguments for the hash functions.
+        """
+        options = options or {}
+        if not (use_processes and workers > 1):
+            run = functools.partial(_hash_task, sniffer=sniffer, cache=cache, **options)
+            yield from OrganizerCore._parallel_map(run, tasks, workers)
+            return
+
+        def cache_key(size, samples):
+            return OrganizerCore._hash_algorithm(size, samples, options.get('algorithm', 'md5'),
+                                                 sparse=options.get('sparse', False))
+
+        stats = {}
+
+        def misses():
+            for task in tasks:
+                path, size, samples = task[:3]
+                if cache is not None:
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        yield task
+                        continue
+                    digest = cache.get(path, st, cache_key(size, samples))
+                    if digest:
+                        hits.append((task, digest))
+                        continue
+                    stats[path] = st
+                yield task
+
+        hits = []
+        worker = functools.partial(_hash_task, **options)
+        for task, digest in OrganizerCore._parallel_map(worker, misses(), workers, True):
+            yield from hits
+            hits.clear()
+            st = stats.pop(task[0], None)
+            if digest and st is not None:
+                cache.put(task[0], st, cache_key(task[1], task[2]), digest)
+            yield task, digest
+        yield from hits
+
+    @staticmethod
+    def find_duplicates(file_paths, progress_callback=None, sniffer=None, cache=None,
+                        workers=1, use_processes=False, algorithm='md5', drop_cache=None,
+                        sparse=False, quick=False, samples=QUICK_SAMPLES, group_callback=None):
+        """Find duplicate files based on content hash.
+
+        Returns a DuplicateGroups mapping digest -> paths. quick=True stops at
+        sampled hashes and marks those groups probable (see
+        confirm_duplicates); group_callback(digest, paths, size, probable)
+        gets each group as soon as it is settled.
+        """
+        width = OrganizerCore.new_hasher(algorithm).digest_size
+        if drop_cache is None:
+            drop_cache = threading.current_thread() is not threading.main_thread()
+        options = {'algorithm': algorithm, 'drop_cache': drop_cache, 'sparse': sparse}
         total = len(file_paths)
-        
-        for i, path in enumerate(file_paths):
-            f_hash = OrganizerCore.get_file_hash(path)
+        done = 0
+
+        def settle(count):
+            nonlocal done
+            done += count
+            if progress_callback and count:
+                progress_callback(done, total)
+
+        def hash_all(tasks):
+            return OrganizerCore._hash_stage(tasks, workers, use_processes, sniffer, cache, options)
+
+        # Files are tracked by PathTable id; per-file state lives in arrays
+        table = PathTable()
+        groups = DuplicateGroups(table, width)
+
+        def emit(raw, ids, size=0, probable=False):
+            groups.add(raw, ids, size, probable)
+            if group_callback:
+                group_callback(raw.hex(), [table[file_id] for file_id in ids], size, probable)
+        sizes = array('Q')
+        devices = array('Q')
+
+        # Tier 0: stat everything once
+        for path in file_paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                settle(1)
+                continue
+            groups.stamp(table.add(path), st)
+            sizes.append(st.st_size)
+            devices.append(st.st_dev)
+
+        def runs(ids):
+            """Yield (size, ids) for each run of equal size in size-sorted ids."""
+            for size, run in itertools.groupby(ids, key=sizes.__getitem__):
+                yield size, array('I', run)
+
+        # Tier 1: size, then collapse names of one inode (hardlinks, symlinks
+        # to listed files, repeated paths) so every inode is read and counted
+        # once. Such names always share a size, so only size runs are checked.
+        order = array('I', sorted(range(len(table)), key=sizes.__getitem__))
+        survivors = array('I')
+        owners = array('I')
+        aliases = array('I')
+        for _, run in runs(order):
+            if len(run) == 1:
+                settle(1)
+                continue
+            inodes = {}
+            kept = array('I')
+            for file_id in run:
+                ino = groups._inodes[file_id]
+                owner = inodes.setdefault((devices[file_id], ino), file_id) if ino else file_id
+                if owner == file_id:
+                    kept.append(file_id)
+                    continue
+                settle(1)
+                if table[owner] != table[file_id]:
+                    owners.append(owner)
+                    aliases.append(file_id)
+            if len(kept) > 1:
+                survivors.extend(kept)
+            else:
+                settle(len(kept))
+        linked = sorted(range(len(owners)), key=owners.__getitem__)
+        for owner, links in itertools.groupby(linked, key=owners.__getitem__):
+            groups.hardlinks.add(struct.pack('QQ', devices[owner], groups._inodes[owner]),
+                                 [owner] + [aliases[i] for i in links])
+        del devices, owners, aliases, linked
+        order = survivors
+        del survivors
+
+        # Empty files are all equal; no need to open them
+        small = []
+        for size, run in runs(order):
+            if size == 0:
+                emit(OrganizerCore.new_hasher(algorithm).digest(), run)
+                settle(len(run))
+            elif size <= OrganizerCore.SMALL_FILE:
+                small.append(run)
+
+        # Small files: comparing the bytes is cheaper than hashing them.
+        # They are read in batches so only SMALL_BATCH bytes are held at once.
+        read = functools.partial(OrganizerCore.read_small, sniffer=sniffer, drop_cache=drop_cache)
+
+        def compare_small(batch):
+            contents = {}
+            ids = (file_id for run in batch for file_id in run)
+            for file_id, data in OrganizerCore._parallel_map(
+                    lambda file_id: read(table[file_id]), ids, workers):
+                if data is not None:
+                    contents[file_id] = data
+                settle(1)
+            for run in batch:
+                by_content = defaultdict(lambda: array('I'))
+                for file_id in run:
+                    if file_id in contents:
+                        by_content[contents[file_id]].append(file_id)
+                for data, group in by_content.items():
+                    if len(group) > 1:
+                        hasher = OrganizerCore.new_hasher(algorithm)
+                        hasher.update(data)
+                        emit(hasher.digest(), group, len(data))
+
+        batch, batch_bytes = [], 0
+        for run in small:
+            batch.append(run)
+            batch_bytes += len(run) * sizes[run[0]]
+            if batch_bytes >= OrganizerCore.SMALL_BATCH:
+                compare_small(batch)
+                batch, batch_bytes = [], 0
+        compare_small(batch)
+        del small, batch
+
+        # Raw digests of the current tier, one fixed-width slot per file id
+        digests = bytearray(len(table) * width)
+        hashed = bytearray(len(table))
+
+        def store(results):
+            for (_, _, _, file_id), digest in results:
+                if digest:
+                    digests[file_id * width:(file_id + 1) * width] = bytes.fromhex(digest)
+                    hashed[file_id] = 1
+                yield file_id, digest
+
+        def digest_of(file_id):
+            return bytes(digests[file_id * width:(file_id + 1) * width])
+
+        def by_digest(run):
+            found = defaultdict(lambda: array('I'))
+            for file_id in run:
+                if hashed[file_id]:
+                    found[digest_of(file_id)].append(file_id)
+            return found
+
+        # Each tier hashes a list of candidate groups and settles a group as
+        # soon as the last of its members is hashed, so results stream out
+        group_of = array('I', bytes(4 * len(table)))
+
+        def finished(batches, results):
+            """Yield the index of each batch once all its members have a result."""
+            remaining = array('I', (len(batch) for batch in batches))
+            for i, batch in enumerate(batches):
+                for file_id in batch:
+                    group_of[file_id] = i
+            for file_id, _ in results:
+                i = group_of[file_id]
+                remaining[i] -= 1
+                if not remaining[i]:
+                    yield i
+
+        # Tier 2: sampled blocks (head + tail, or more in quick mode)
+        samples = max(samples, 2) if quick else 2
+        sampled = [run for size, run in runs(order) if size > OrganizerCore.SMALL_FILE]
+        del order
+        tasks = ((table[file_id], sizes[file_id], samples, file_id)
+                 for run in sampled for file_id in run)
+        pending = []
+        for i in finished(sampled, store(hash_all(tasks))):
+            run, sampled[i] = sampled[i], None
+            size = sizes[run[0]]
+            settle(sum(1 for file_id in run if not hashed[file_id]))
+            for raw, group in by_digest(run).items():
+                if len(group) < 2:
+                    settle(1)
+                elif size <= samples * OrganizerCore.PARTIAL_SAMPLE:
+                    # The sample covered the whole file, so it is the full hash
+                    emit(raw, group, size)
+                    settle(len(group))
+                elif quick:
+                    emit(raw, group, size, probable=True)
+                    settle(len(group))
+                else:
+                    pending.append(group)
+        del sampled
+
+        # Tier 3: full content
+        for group in pending:
+            for file_id in group:
+                hashed[file_id] = 0
+        tasks = ((table[file_id], sizes[file_id], 0, file_id)
+                 for group in pending for file_id in group)
+
+        def counted(results):
+            for result in results:
+                settle(1)
+                yield result
+
+        for i in finished(pending, counted(store(hash_all(tasks)))):
+            group, pending[i] = pending[i], None
+            for raw, same in by_digest(group).items():
+                if len(same) > 1:
+                    emit(raw, same, sizes[group[0]])
+
+        if cache is not None:
+            cache.flush()
+        return groups
+
+    @staticmethod
+    def confirm_duplicates(groups, progress_callback=None, sniffer=None, cache=None,
+                           workers=1, use_processes=False, algorithm='md5', drop_cache=None,
+                           sparse=False, group_callback=None):
+        """Full-hash the probable groups of a quick find_duplicates result.
+
+        Use the same algorithm as the quick pass; other options match
+        find_duplicates.
+        """
+        if drop_cache is None:
+            drop_cache = threading.current_thread() is not threading.main_thread()
+        options = {'algorithm': algorithm, 'drop_cache': drop_cache, 'sparse': sparse}
+        confirmed = DuplicateGroups(groups.paths, groups.key_size)
+        confirmed.hardlinks = groups.hardlinks
+        confirmed._inodes, confirmed._mtimes = groups._inodes, groups._mtimes
+
+        def emit(raw, ids, size):
+            confirmed.add(raw, ids, size)
+            if group_callback:
+                group_callback(raw.hex(), [groups.paths[file_id] for file_id in ids], size, False)
+
+        probable = []
+        for i in range(len(groups)):
+            if groups._probable[i]:
+                probable.append(i)
+            else:
+                emit(groups._raw(i), groups._ids(i), groups._sizes[i])
+
+        # Split each probable group as soon as its last member is hashed
+        owner = {file_id: i for i in probable for file_id in groups._ids(i)}
+        remaining = {i: len(groups._ids(i)) for i in probable}
+        total = len(owner)
+        full = {}
+        tasks = ((groups.paths[file_id], groups._sizes[i], 0, file_id)
+                 for i in probable for file_id in groups._ids(i))
+        for done, ((_, _, _, file_id), f_hash) in enumerate(OrganizerCore._hash_stage(
+                tasks, workers, use_processes, sniffer, cache, options), 1):
             if f_hash:
-                hash_map[f_hash].append(path)
-            
+                full[file_id] = bytes.fromhex(f_hash)
             if progress_callback:
-                progress_callback(i + 1, total)
-                
-        return {k: v for k, v in hash_map.items() if len(v) > 1}
+                progress_callback(done, total)
+            i = owner[file_id]
+            remaining[i] -= 1
+            if remaining[i]:
+                continue
+            by_full = defaultdict(lambda: array('I'))
+            for member in groups._ids(i):
+                if member in full:
+                    by_full[full.pop(member)].append(member)
+            for raw, group in by_full.items():
+                if len(group) > 1:
+                    emit(raw, group, groups._sizes[i])
+        if cache is not None:
+            cache.flush()
+        return confirmed
+
+    DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
 
     @staticmethod
-    def safe_move(src, dst_dir):
-        """Move file with collision handling (e.g., file_1.txt)."""
+    def stream_duplicates(file_paths, memory_limit=DEFAULT_MEMORY_LIMIT, progress_callback=None,
+                          sniffer=None, cache=None, workers=1, use_processes=False,
+                          algorithm='md5', drop_cache=None, sparse=False, spill_dir=None):
+        """Yield (digest, paths) duplicate groups using bounded memory.
+
+        paths is a lazy iterator: read it before asking for the next group.
+        Spill files go under spill_dir; other options match find_duplicates.
+        """
+        width = OrganizerCore.new_hasher(algorithm).digest_size
+        if drop_cache is None:
+            drop_cache = threading.current_thread() is not threading.main_thread()
+        options = {'algorithm': algorithm, 'drop_cache': drop_cache, 'sparse': sparse}
+        total = len(file_paths) if hasattr(file_paths, '__len__') else None
+        # One sorter fills while the previous one is merged from disk
+        budget = max(1024 * 1024, memory_limit // 2)
+        done = 0
+
+        def settle(count):
+            nonlocal done
+            done += count
+            if progress_callback and count:
+                progress_callback(done, total)
+
+        def hash_all(tasks):
+            return OrganizerCore._hash_stage(tasks, workers, use_processes, sniffer, cache, options)
+
+        def multiples(records, key):
+            """Yield groups of records sharing key, settling singletons."""
+            for _, group in itertools.groupby(records, key=key):
+                first = next(group)
+                second = next(group, None)
+                if second is None:
+                    settle(1)
+                    continue
+                yield itertools.chain((first, second), group)
+
+        with tempfile.TemporaryDirectory(prefix='organizer-', dir=spill_dir) as tmp:
+            spool = PathSpool(tmp)
+            try:
+                # Tier 1: size, with hardlinks adjacent so each inode is kept once
+                by_size = ExternalSorter('QQQQ', tmp, budget)
+                for path in file_paths:
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        settle(1)
+                        continue
+                    by_size.add(st.st_size, st.st_dev, st.st_ino, spool.add(path))
+                spool.flush()
+
+                def inodes(records):
+                    for _, group in itertools.groupby(records, key=lambda r: (r[0], r[1], r[2])):
+                        first = next(group)
+                        if first[2]:
+                            settle(sum(1 for _ in group))
+                            yield first
+                        else:
+                            yield first
+                            yield from group
+
+                # Tier 2: head + tail sample; files within two samples get their full hash
+                by_partial = ExternalSorter(f'Q{width}sQ', tmp, budget)
+                tasks = ((spool[path_id], size, 2, path_id)
+                         for group in multiples(inodes(by_size), key=lambda r: r[0])
+                         for size, _, _, path_id in group)
+                for (_, size, _, path_id), p_hash in hash_all(tasks):
+                    if p_hash:
+                        by_partial.add(size, bytes.fromhex(p_hash), path_id)
+                    else:
+                        settle(1)
+
+                # Tier 3: full content for groups the sample could not settle
+                by_full = ExternalSorter(f'Q{width}sQ', tmp, budget)
+
+                def pending():
+                    for group in multiples(by_partial, key=lambda r: (r[0], r[1])):
+                        for size, digest, path_id in group:
+                            if size <= 2 * OrganizerCore.PARTIAL_SAMPLE:
+                                by_full.add(size, digest, path_id)
+                            else:
+                                yield spool[path_id], size, 0, path_id
+
+                for (_, size, _, path_id), f_hash in hash_all(pending()):
+                    if f_hash:
+                        by_full.add(size, bytes.fromhex(f_hash), path_id)
+                    else:
+                        settle(1)
+                if cache is not None:
+                    cache.flush()
+
+                def members(records):
+                    for _, _, path_id in records:
+                        settle(1)
+                        yield spool[path_id]
+
+                for group in multiples(by_full, key=lambda r: (r[0], r[1])):
+                    first = next(group)
+                    records = itertools.chain((first,), group)
+                    yield first[1].hex(), members(records)
+                    # Skip whatever the caller left unread
+                    for _ in records:
+                        settle(1)
+            finally:
+                spool.close()
+
+    @staticmethod
+    def export_duplicates(groups, dest, fmt=None):
+        """Write duplicate groups to a JSONL or CSV file as they are iterated.
+
+        fmt defaults to dest's extension. Returns the number of groups written.
+        """
+        fmt = (fmt or os.path.splitext(dest)[1].lstrip('.') or 'jsonl').lower()
+        if fmt not in ('jsonl', 'csv'):
+            raise ValueError(f"Unsupported export format: {fmt}")
+        known = isinstance(groups, DuplicateGroups)
+        items = groups.items() if isinstance(groups, Mapping) else groups
+        count = 0
+        with open(dest, 'w', newline='', encoding='utf-8', errors='surrogateescape') as f:
+            writer = csv.writer(f) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(['digest', 'size', 'path'])
+            for digest, paths in items:
+                paths = iter(paths)
+                first = next(paths, None)
+                if first is None:
+                    continue
+                paths = itertools.chain((first,), paths)
+                if known:
+                    size = groups.size(digest)
+                else:
+                    try:
+                        size = os.path.getsize(first)
+                    except OSError:
+                        size = 0
+                if writer:
+                    writer.writerows([digest, size, path] for path in paths)
+                else:
+                    f.write(f'{{"digest": {json.dumps(digest)}, "size": {size}, "paths": [')
+                    members = 0
+                    for path in paths:
+                        f.write((', ' if members else '') + json.dumps(path))
+                        members += 1
+                    f.write(f'], "reclaimable": {(members - 1) * size}}}\n')
+                count += 1
+        return count
+
+    KEEP_POLICIES = ('oldest', 'newest', 'shortest', 'preferred')
+    DEDUPE_ACTIONS = ('hardlink', 'reflink', 'delete')
+    FICLONE = 0x40049409
+    _temp_ids = itertools.count()
+
+    @staticmethod
+    def choose_keeper(paths, stats, keep='oldest', prefer=()):
+        """Index of the copy to keep in a group under a keep policy.
+
+        oldest/newest compare mtimes, shortest the path length. preferred
+        keeps the oldest copy inside one of the prefer directories, falling
+        back to the oldest overall. Ties go to the earlier path.
+        """
+        order = range(len(paths))
+        if keep == 'preferred':
+            roots = [os.path.join(os.path.abspath(d), '') for d in prefer]
+            inside = [i for i in order if os.path.abspath(paths[i]).startswith(tuple(roots))]
+            order = inside or order
+        if keep == 'newest':
+            return max(order, key=lambda i: (stats[i].st_mtime_ns, -i))
+        if keep == 'shortest':
+            return min(order, key=lambda i: (len(paths[i]), i))
+        return min(order, key=lambda i: (stats[i].st_mtime_ns, i))
+
+    @staticmethod
+    def _temp_name(path):
+        """An unused sibling name for building a replacement of path."""
+        head, name = os.path.split(path)
+        return os.path.join(head, f'.{name}.organizer-{os.getpid()}-{next(OrganizerCore._temp_ids)}')
+
+    @staticmethod
+    def reflink(src, dst):
+        """Create dst sharing src's data blocks via the FICLONE ioctl.
+
+        Raises OSError where the platform or filesystem cannot clone.
+        """
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform", dst)
+        with open(src, 'rb') as source, open(dst, 'xb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), OrganizerCore.FICLONE, source.fileno())
+            except OSError:
+                target.close()
+                os.unlink(dst)
+                raise
+
+    @staticmethod
+    def _dedupe_file(keeper, keeper_st, path, st, action):
+        """Replace or delete one duplicate and return its undo record.
+
+        Both files are stat'ed again right before acting, and anything that
+        changed since the group was checked is left alone.
+        """
+        for name, before in ((keeper, keeper_st), (path, st)):
+            now = os.stat(name)
+            if (now.st_ino, now.st_size, now.st_mtime_ns) != (before.st_ino, before.st_size,
+                                                               before.st_mtime_ns):
+                raise RuntimeError(f"{name} changed since it was checked")
+        record = {'action': action, 'path': path, 'keep': keeper, 'size': st.st_size,
+                  'mode': st.st_mode, 'uid': st.st_uid, 'gid': st.st_gid,
+                  'atime_ns': st.st_atime_ns, 'mtime_ns': st.st_mtime_ns}
+        if action == 'delete':
+            os.unlink(path)
+            return record
+
+        temp = OrganizerCore._temp_name(path)
+        if action == 'hardlink':
+            os.link(keeper, temp)
+        else:
+            OrganizerCore.reflink(keeper, temp)
         try:
+            if action == 'reflink':
+                shutil.copystat(path, temp)
+            os.replace(temp, path)
+        except OSError:
+            os.unlink(temp)
+            raise
+        return record
+
+    @staticmethod
+    def _dedupe_batch(batch, action, keep, prefer):
+        """Dedupe a list of (digest, paths, size, stamps) groups; returns (records, errors).
+
+        Files whose size, inode or mtime no longer match the scan are left
+        alone. Without scan stamps (plain (digest, paths) input) each copy is
+        compared with the keeper's content right before acting instead.
+        """
+        records, errors = [], []
+        for digest, paths, size, stamps in batch:
+            members, stats = [], []
+            for i, path in enumerate(paths):
+                try:
+                    st = os.stat(path)
+                except OSError as e:
+                    errors.append((path, str(e)))
+                    continue
+                if (size is not None and st.st_size != size) or \
+                        (stamps and (st.st_ino, st.st_mtime_ns) != stamps[i]):
+                    errors.append((path, "changed since the scan"))
+                    continue
+                members.append(path)
+                stats.append(st)
+            if len(members) < 2:
+                continue
+            k = OrganizerCore.choose_keeper(members, stats, keep, prefer)
+            for path, st in zip(members, stats):
+                if path == members[k] or (st.st_dev, st.st_ino) == (stats[k].st_dev, stats[k].st_ino):
+                    continue
+                try:
+                    if not stamps and not OrganizerCore.same_content(members[k], path):
+                        errors.append((path, "content differs from the kept copy"))
+                        continue
+                    records.append(OrganizerCore._dedupe_file(members[k], stats[k], path, st, action))
+                except (OSError, RuntimeError) as e:
+                    errors.append((path, str(e)))
+        return records, errors
+
+    @staticmethod
+    def dedupe(groups, action='hardlink', keep='oldest', prefer=(), workers=1,
+               progress_callback=None, batch_size=64):
+        """Keep one copy per duplicate group and hardlink, reflink or delete the rest.
+
+        keep is one of KEEP_POLICIES and action one of DEDUPE_ACTIONS.
+        Returns (records, errors) where records feed undo_dedupe.
+        """
+        if action not in OrganizerCore.DEDUPE_ACTIONS:
+            raise ValueError(f"Unknown dedupe action: {action}")
+        if keep not in OrganizerCore.KEEP_POLICIES:
+            raise ValueError(f"Unknown keep policy: {keep}")
+        known = isinstance(groups, DuplicateGroups)
+        probable = groups.probable if known else set()
+        items = groups.items() if isinstance(groups, Mapping) else groups
+        total = len(groups) if hasattr(groups, '__len__') else None
+        records, errors = [], []
+
+        def batches():
+            batch = []
+            for digest, paths in items:
+                if digest in probable:
+                    errors.extend((path, "probable duplicate, confirm it first") for path in paths)
+                    continue
+                if known:
+                    batch.append((digest, paths, groups.size(digest), groups.stamps(digest)))
+                else:
+                    batch.append((digest, paths, None, None))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        run = functools.partial(OrganizerCore._dedupe_batch, action=action, keep=keep,
+                                prefer=prefer)
+        done = 0
+        for batch, (batch_records, batch_errors) in OrganizerCore._parallel_map(run, batches(),
+                                                                                 workers):
+            records.extend(batch_records)
+            errors.extend(batch_errors)
+            done += len(batch)
+            if progress_callback:
+                progress_callback(done, total)
+        return records, errors
+
+    @staticmethod
+    def undo_dedupe(records):
+        """Turn deduped paths back into independent copies of their keepers.
+
+        Restores each file's mode, times and, where permitted, owner from
+        the record. Returns (restored, errors).
+        """
+        restored, errors = 0, []
+        for record in reversed(records):
+            path, keeper = record['path'], record['keep']
+            temp = OrganizerCore._temp_name(path)
+            try:
+                if os.path.getsize(keeper) != record['size']:
+                    raise RuntimeError(f"{keeper} changed since the dedupe")
+                shutil.copyfile(keeper, temp)
+                os.chmod(temp, stat_module.S_IMODE(record['mode']))
+                if hasattr(os, 'chown'):
+                    try:
+                        os.chown(temp, record['uid'], record['gid'])
+                    except PermissionError:
+                        pass
+                os.utime(temp, ns=(record['atime_ns'], record['mtime_ns']))
+                os.replace(temp, path)
+                restored += 1
+            except (OSError, RuntimeError) as e:
+                if os.path.exists(temp):
+                    os.unlink(temp)
+                errors.append((path, str(e)))
+        return restored, errors
+
+    COLLISION_POLICIES = ('rename', 'skip', 'dedupe')
+
+    @staticmethod
+    def same_content(a, b, cache=None, algorithm='md5', b_dir_fd=None):
+        """Cheaply decide whether two files hold the same bytes.
+
+        Sizes are compared first and hardlinks are equal outright. Small
+        files are compared directly; larger ones on a partial hash and only
+        then a full hash, both served from cache when one is given. With
+        b_dir_fd, b is a name in that directory descriptor.
+        """
+        st_a, st_b = os.stat(a), os.stat(b, dir_fd=b_dir_fd)
+        if st_a.st_size != st_b.st_size:
+            return False
+        if st_a.st_ino and (st_a.st_dev, st_a.st_ino) == (st_b.st_dev, st_b.st_ino):
+            return True
+        size = st_a.st_size
+        if size <= OrganizerCore.SMALL_FILE:
+            data = OrganizerCore.read_small(a)
+            return data is not None and data == OrganizerCore.read_small(b, dir_fd=b_dir_fd)
+        for digest in (functools.partial(OrganizerCore.get_partial_hash, size=size),
+                       OrganizerCore.get_file_hash):
+            first = digest(a, cache=cache, algorithm=algorithm)
+            if first is None or first != digest(b, cache=cache, algorithm=algorithm,
+                                                 dir_fd=b_dir_fd):
+                return False
+        return True
+
+    COPY_CHUNK = 16 * 1024 * 1024
+    _COPY_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+                         errno.ENOTSUP, errno.ENOTSOCK}
+
+    @staticmethod
+    def copy_file(src, dst, progress_callback=None, src_dir_fd=None, dst_dir_fd=None):
+        """Copy src into a new file dst and flush it to disk.
+
+        An existing dst raises FileExistsError; progress_callback gets
+        (copied, size).
+        """
+        chunk = OrganizerCore.COPY_CHUNK
+        with open(src, 'rb', buffering=0, opener=OrganizerCore._opener(src_dir_fd)) as fsrc:
+            st = os.fstat(fsrc.fileno())
+            size = st.st_size
+            with open(dst, 'xb', buffering=0, opener=OrganizerCore._opener(dst_dir_fd)) as fdst:
+                try:
+                    infd, outfd = fsrc.fileno(), fdst.fileno()
+                    copied = 0
+                    kernel = [f for f in (getattr(os, 'copy_file_range', None),
+                                          getattr(os, 'sendfile', None)) if f]
+                    while True:
+                        if kernel:
+                            try:
+                                if kernel[0] is os.sendfile:
+                                    sent = os.sendfile(outfd, infd, copied, chunk)
+                                else:
+                                    sent = kernel[0](infd, outfd, chunk, copied, copied)
+                            except OSError as e:
+                                # Unsupported for this pair: go on with the next
+                                # mechanism from the current offset
+                                if e.errno not in OrganizerCore._COPY_UNSUPPORTED:
+                                    raise
+                                kernel.pop(0)
+                                os.lseek(outfd, copied, os.SEEK_SET)
+                                continue
+                        else:
+                            fsrc.seek(copied)
+                            data = fsrc.read(chunk)
+                            sent = len(data)
+                            view = memoryview(data)
+                            while view:
+                                # Unbuffered writes may be short
+                                view = view[fdst.write(view):]
+                        if not sent:
+                            break
+                        copied += sent
+                        if progress_callback:
+                            progress_callback(copied, size)
+                    if copied != size:
+                        raise OSError(errno.EIO, f"Short copy ({copied} of {size} bytes)", src)
+                    if hasattr(os, 'fchmod'):
+                        os.fchmod(outfd, stat_module.S_IMODE(st.st_mode))
+                    else:
+                        os.chmod(dst, stat_module.S_IMODE(st.st_mode))
+                    OrganizerCore._copy_xattrs(infd, outfd)
+                    if os.utime in os.supports_fd:
+                        os.utime(outfd, ns=(st.st_atime_ns, st.st_mtime_ns))
+                    os.fsync(outfd)
+                except BaseException:
+                    fdst.close()
+                    os.unlink(dst, dir_fd=dst_dir_fd)
+                    raise
+        if os.utime not in os.supports_fd:
+            # Set after closing: Windows updates mtime on close
+            os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns), dir_fd=dst_dir_fd)
+        if os.name != 'nt':
+            # Make the new name durable before the caller drops the source
+            if dst_dir_fd is None:
+                dir_fd = os.open(os.path.dirname(dst) or os.curdir, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            else:
+                os.fsync(dst_dir_fd)
+
+    @staticmethod
+    def _copy_xattrs(infd, outfd):
+        """Copy extended attributes between open files, like shutil.copystat.
+
+        Attributes the target refuses are skipped, as are platforms
+        without xattr support.
+        """
+        if not hasattr(os, 'listxattr'):
+            return
+        try:
+            names = os.listxattr(infd)
+        except OSError as e:
+            if e.errno in (errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+                return
+            raise
+        for name in names:
+            try:
+                os.setxattr(outfd, name, os.getxattr(infd, name))
+            except OSError as e:
+                if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.ENODATA, errno.EINVAL):
+                    raise
+
+    AT_FDCWD = -100
+    RENAME_NOREPLACE = 1
+
+    @staticmethod
+    def _renameat2(src, dst, src_dir_fd=None, dst_dir_fd=None):
+        """renameat2(RENAME_NOREPLACE); False where the kernel or filesystem lacks it."""
+        if _renameat2 is None:
+            return False
+        fds = [OrganizerCore.AT_FDCWD if fd is None else fd for fd in (src_dir_fd, dst_dir_fd)]
+        if _renameat2(fds[0], os.fsencode(src), fds[1], os.fsencode(dst),
+                      OrganizerCore.RENAME_NOREPLACE) == 0:
+            return True
+        err = ctypes.get_errno()
+        if err in (errno.EINVAL, errno.ENOSYS):
+            return False
+        raise OSError(err, os.strerror(err), src, None, dst)
+
+    @staticmethod
+    def _rename_noreplace(src, dst, src_dir_fd=None, dst_dir_fd=None):
+        """Rename src to dst, raising FileExistsError rather than replacing dst.
+
+        Atomic on Windows and through renameat2; elsewhere dst is checked
+        just before a plain rename.
+        """
+        if os.name == 'nt':
+            os.rename(src, dst)
+            return
+        if OrganizerCore._renameat2(src, dst, src_dir_fd, dst_dir_fd):
+            return
+        try:
+            os.stat(dst, dir_fd=dst_dir_fd, follow_symlinks=False)
+        except FileNotFoundError:
+            os.rename(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+            return
+        raise FileExistsError(errno.EEXIST, "File exists", dst)
+
+    @staticmethod
+    def _place(src, dst, src_dir_fd=None, dst_dir_fd=None, progress_callback=None):
+        """Move src to dst, never replacing an existing dst.
+
+        Raises FileExistsError if dst appeared meanwhile. On one device this
+        is a no-replace rename, or a hardlink plus unlink where renameat2 is
+        missing; across devices the file is copied with copy_file. With dir
+        fds, src and dst are names relative to them.
+        """
+        st = os.stat(src, dir_fd=src_dir_fd, follow_symlinks=False)
+        if dst_dir_fd is None:
+            dst_dev = os.stat(os.path.dirname(dst) or os.curdir).st_dev
+        else:
+            dst_dev = os.fstat(dst_dir_fd).st_dev
+        if st.st_dev == dst_dev:
+            try:
+                if os.name == 'nt' or stat_module.S_ISLNK(st.st_mode):
+                    OrganizerCore._rename_noreplace(src, dst, src_dir_fd, dst_dir_fd)
+                    return
+                if OrganizerCore._renameat2(src, dst, src_dir_fd, dst_dir_fd):
+                    return
+                try:
+                    os.link(src, dst, src_dir_fd=src_dir_fd, dst_dir_fd=dst_dir_fd)
+                except FileExistsError:
+                    raise
+                except OSError as e:
+                    if e.errno == errno.EXDEV:
+                        raise
+                    # Hardlinks refused (FAT, SMB, protected_hardlinks)
+                    OrganizerCore._rename_noreplace(src, dst, src_dir_fd, dst_dir_fd)
+                    return
+                os.unlink(src, dir_fd=src_dir_fd)
+                return
+            except OSError as e:
+                # Bind mounts share st_dev yet still refuse cross-mount renames
+                if e.errno != errno.EXDEV:
+                    raise
+        if stat_module.S_ISLNK(st.st_mode):
+            os.symlink(os.readlink(src, dir_fd=src_dir_fd), dst, dir_fd=dst_dir_fd)
+        else:
+            OrganizerCore.copy_file(src, dst, progress_callback, src_dir_fd, dst_dir_fd)
+        os.unlink(src, dir_fd=src_dir_fd)
+
+    @staticmethod
+    def move_file(src, dst_dir, collision='rename', cache=None, index=None, make_dirs=True,
+                  dirs=None, progress_callback=None):
+        """Move src into dst_dir and return a MoveResult.
+
+        collision is 'rename', 'skip' or 'dedupe'. Share one index (and
+        dirs, a DirectoryHandles) across a run; progress_callback gets
+        (copied, size) on cross-device moves.
+        """
+        if collision not in OrganizerCore.COLLISION_POLICIES:
+            raise ValueError(f"Unknown collision policy: {collision}")
+        if index is None:
+            index = DestinationIndex()
+        if make_dirs:
             os.makedirs(dst_dir, exist_ok=True)
-            filename = os.path.basename(src)
-            base, ext = os.path.splitext(filename)
-            
-            dst_path = os.path.join(dst_dir, filename)
-            counter = 1
-            
-            # Avoid overwriting and avoid moving to the same spot
-            if os.path.abspath(src) == os.path.abspath(dst_path):
-                return src, False
-
-            while os.path.exists(dst_path):
-                dst_path = os.path.join(dst_dir, f"{base}_{counter}{ext}")
-                counter += 1
-                
-            shutil.move(src, dst_path)
-            return dst_path, True
+        filename = os.path.basename(src)
+
+        # Avoid overwriting and avoid moving to the same spot
+        if os.path.abspath(src) == os.path.abspath(os.path.join(dst_dir, filename)):
+            return MoveResult(src, src, 'unchanged')
+
+        with contextlib.ExitStack() as stack:
+            if dirs is None:
+                src_fd = dst_fd = None
+            else:
+                src_fd = stack.enter_context(dirs.open(os.path.dirname(src) or os.curdir))
+                dst_fd = stack.enter_context(dirs.open(dst_dir))
+
+            def at(name):
+                return os.path.join(dst_dir, name) if dst_fd is None else name
+
+            def identical(name):
+                try:
+                    return collision != 'rename' and OrganizerCore.same_content(
+                        src, at(name), cache, b_dir_fd=dst_fd)
+                except FileNotFoundError:
+                    return False
+
+            def fingerprint(name):
+                return OrganizerCore.get_partial_hash(at(name), size, cache=cache,
+                                                      dir_fd=dst_fd)
+
+            def merge(name):
+                dst_path = os.path.join(dst_dir, name)
+                if collision == 'skip':
+                    return MoveResult(src, dst_path, 'skipped')
+                os.unlink(src if src_fd is None else filename, dir_fd=src_fd)
+                return MoveResult(src, dst_path, 'deduped')
+
+            size = digest = None
+            if collision != 'rename':
+                size = os.stat(src).st_size
+                digest = OrganizerCore.get_partial_hash(src, size, cache=cache)
+                if digest is not None:
+                    for name in index.matching(dst_dir, filename, size, digest, fingerprint,
+                                               dst_fd):
+                        if identical(name):
+                            return merge(name)
+
+            while True:
+                name = index.claim(dst_dir, filename, dst_fd)
+                try:
+                    if dst_fd is None:
+                        OrganizerCore._place(src, os.path.join(dst_dir, name),
+                                             progress_callback=progress_callback)
+                    else:
+                        OrganizerCore._place(filename, name, src_fd, dst_fd, progress_callback)
+                except FileExistsError:
+                    # Written behind the index's back; the name stays taken
+                    if identical(name):
+                        return merge(name)
+                    continue
+                except BaseException:
+                    index.release(dst_dir, name)
+                    raise
+                if size is not None:
+                    index.record(dst_dir, filename, name, size, digest)
+                return MoveResult(src, os.path.join(dst_dir, name), 'moved')
+
+    MOVE_BATCH = 64
+
+    @staticmethod
+    def move_many(moves, collision='rename', cache=None, workers=1, progress_callback=None,
+                  index=None, batch_size=MOVE_BATCH, bytes_callback=None):
+        """Move many (src, dst_dir) pairs and return (results, errors).
+
+        Options match move_file; bytes_callback gets (src, copied, size).
+        """
+        if index is None:
+            index = DestinationIndex()
+        by_dir = defaultdict(list)
+        for src, dst_dir in moves:
+            by_dir[dst_dir].append(src)
+        total = sum(len(v) for v in by_dir.values())
+        results, errors = [], []
+        done = 0
+
+        def settle(count):
+            nonlocal done
+            done += count
+            if progress_callback and count:
+                progress_callback(done, total)
+
+        def make_dir(dst_dir):
+            try:
+                os.makedirs(dst_dir, exist_ok=True)
+            except OSError as e:
+                return str(e)
+
+        batches = []
+        for dst_dir, failed in OrganizerCore._parallel_map(make_dir, list(by_dir), workers):
+            srcs = by_dir.pop(dst_dir)
+            if failed:
+                errors.extend((src, failed) for src in srcs)
+                settle(len(srcs))
+                continue
+            batches.extend((dst_dir, srcs[i:i + batch_size])
+                           for i in range(0, len(srcs), batch_size))
+
+        def run(batch):
+            dst_dir, srcs = batch
+            outcome = []
+            for src in srcs:
+                report = bytes_callback and functools.partial(bytes_callback, src)
+                try:
+                    outcome.append(OrganizerCore.move_file(src, dst_dir, collision, cache, index,
+                                                           make_dirs=False, dirs=dirs,
+                                                           progress_callback=report))
+                except (OSError, ValueError) as e:
+                    outcome.append((src, str(e)))
+            return outcome
+
+        dirs = DirectoryHandles() if DirectoryHandles.SUPPORTED else None
+        try:
+            for _, outcome in OrganizerCore._parallel_map(run, batches, workers):
+                for item in outcome:
+                    (results if isinstance(item, MoveResult) else errors).append(item)
+                settle(len(outcome))
+        finally:
+            if dirs is not None:
+                dirs.close()
+        return results, errors
+
+    @staticmethod
+    def safe_move(src, dst_dir, collision='rename', cache=None, index=None):
+        """Move file with collision handling (e.g., file_1.txt)."""
+        try:
+            result = OrganizerCore.move_file(src, dst_dir, collision, cache, index)
+            return result.dst, result.moved
         except Exception as e:
             raise RuntimeError(f"Move failed: {e}")
+
+
+def _hash_task(task, sparse=False, **options):
+    """Hash one (path, size, samples, ...) task; module level so processes can pickle it."""
+    path, size, samples = task[:3]
+    if samples:
+        return OrganizerCore.get_partial_hash(path, size, samples=samples, **options)
+    return OrganizerCore.get_file_hash(path, sparse=sparse, **options)
+
+
+def main(argv=None):
+    """Command-line entry point for the engine's benchmarks and headless tools."""
+    import argparse
+    parser = argparse.ArgumentParser(description="File Organizer core engine tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help="report hashing throughput on this machine")
+    bench.add_argument('path', nargs='?', help="file to hash (default: temporary file)")
+    bench.add_argument('--size-mb', type=int, default=256, help="size of the temporary file")
+    bench.add_argument('--algorithms', nargs='+', default=list(OrganizerCore.HASH_ALGORITHMS))
+    residency = sub.add_parser('cache-residency',
+                               help="show page-cache growth while hashing, with and without drop_cache")
+    residency.add_argument('path', nargs='?', help="file to hash (default: temporary file)")
+    residency.add_argument('--size-mb', type=int, default=512, help="size of the temporary file")
+    dupes = sub.add_parser('dupes', help="list duplicate files below a folder in bounded memory")
+    dupes.add_argument('folder')
+    dupes.add_argument('--memory-mb', type=int,
+                       default=OrganizerCore.DEFAULT_MEMORY_LIMIT // (1024 * 1024),
+                       help="memory ceiling for the duplicate index")
+    dupes.add_argument('--spill-dir', help="directory for sort runs (default: system temp)")
+    dupes.add_argument('--algorithm', default='md5', choices=OrganizerCore.HASH_ALGORITHMS)
+    dupes.add_argument('--workers', type=int, default=1)
+    dupes.add_argument('--output', help="write groups to a .jsonl or .csv file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        print(f"{'algorithm':<14}{'method':<8}{'chunk':>10}{'MB/s':>12}")
+        for row in OrganizerCore.benchmark_hashing(args.path, args.size_mb, args.algorithms):
+            chunk = OrganizerCore.format_size(row['chunk_size'])
+            print(f"{row['algorithm']:<14}{row['method']:<8}{chunk:>10}{row['mb_per_s']:>12.1f}")
+    elif args.command == 'cache-residency':
+        print(f"{'drop_cache':<12}{'peak MB':>10}{'final MB':>10}")
+        for row in OrganizerCore.measure_cache_residency(args.path, args.size_mb):
+            print(f"{str(row['drop_cache']):<12}{row['peak_mb']:>10.1f}{row['final_mb']:>10.1f}")
+    elif args.command == 'dupes':
+        ignore = IgnoreRules.load(args.folder)
+        paths = (entry.path for entry in OrganizerCore.walk(args.folder, ignore=ignore))
+        groups = OrganizerCore.stream_duplicates(
+            paths, args.memory_mb * 1024 * 1024, workers=args.workers,
+            algorithm=args.algorithm, spill_dir=args.spill_dir)
+        if args.output:
+            count = OrganizerCore.export_duplicates(groups, args.output)
+            print(f"Wrote {count} duplicate groups to {args.output}")
+        else:
+            for digest, group in groups:
+                print(digest)
+                for path in group:
+                    print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ Date: 2026-01-23
 """
 
 import os
-import shutil
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
@@ -13,6 +12,7 @@ from datetime import datetime
 import json
 from typing import Dict, List
 import threading
+from core_logic import OrganizerCore, IgnoreRules, CategoryRules, ContentSniffer, DestinationIndex
 
 class FileOrganizer:
     """Main File Organizer Application"""
@@ -41,6 +41,10 @@ class FileOrganizer:
         self.organize_mode = tk.StringVar(value="category")  # category or date
         self.create_subfolders = tk.BooleanVar(value=True)
         self.preview_mode = tk.BooleanVar(value=True)
+        self.include_subfolders = tk.BooleanVar(value=False)
+        self.collision_policy = tk.StringVar(value="rename")
+        self.ignore_patterns = []
+        self.sniffer = ContentSniffer()
         self.file_list = []
         
         # Setup UI
@@ -110,6 +114,19 @@ class FileOrganizer:
                        variable=self.create_subfolders).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(options_frame, text="Preview mode (don't move files)", 
                        variable=self.preview_mode).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(options_frame, text="Include subfolders (recursive scan)", 
+                       variable=self.include_subfolders).pack(anchor=tk.W, pady=2)
+        
+        collision_frame = ttk.Frame(options_frame)
+        collision_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Label(collision_frame, text="Identical name & content:").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Keep both (file_1)", variable=self.collision_policy,
+                       value="rename").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Skip", variable=self.collision_policy,
+                       value="skip").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Remove source copy", variable=self.collision_policy,
+                       value="dedupe").pack(side=tk.LEFT)
         
         # Action buttons frame
         action_frame = ttk.Frame(main_frame)
@@ -200,33 +217,35 @@ class FileOrganizer:
     def _scan_folder_thread(self, folder):
         """Thread function to scan folder"""
         try:
-            files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
+            total = 0
             
-            for filename in files:
-                filepath = os.path.join(folder, filename)
-                file_ext = Path(filename).suffix.lower()
-                file_size = os.path.getsize(filepath)
+            recursive = self.include_subfolders.get()
+            ignore = IgnoreRules.load(folder, self.ignore_patterns)
+            self.category_rules = CategoryRules(self.categories)
+            for entry in OrganizerCore.scan_folder(folder, recursive=recursive, ignore=ignore):
+                file_ext = Path(entry.name).suffix.lower()
                 
                 # Determine destination
                 if self.organize_mode.get() == "category":
-                    destination = self._get_category_folder(file_ext)
+                    destination = self._get_category_folder(entry)
                 else:
-                    destination = self._get_date_folder(filepath)
+                    destination = self._get_date_folder(entry.mtime)
                 
                 file_info = {
-                    'name': filename,
-                    'path': filepath,
+                    'name': entry.name,
+                    'path': entry.path,
                     'ext': file_ext,
-                    'size': file_size,
+                    'size': entry.size,
                     'destination': destination
                 }
                 
                 self.file_list.append(file_info)
+                total += 1
                 
                 # Update UI in main thread
                 self.root.after(0, self._add_tree_item, file_info)
             
-            self.root.after(0, lambda: self.status_var.set(f"Found {len(files)} files"))
+            self.root.after(0, lambda: self.status_var.set(f"Found {total} files"))
             
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("Error", f"Scan failed: {str(e)}"))
@@ -241,16 +260,12 @@ class FileOrganizer:
             file_info['destination']
         ))
         
-    def _get_category_folder(self, extension):
-        """Get category folder for file extension"""
-        for category, extensions in self.categories.items():
-            if extension in extensions:
-                return category
-        return "Others"
+    def _get_category_folder(self, entry):
+        """Get category folder for file extension (or sniffed content type)"""
+        return OrganizerCore.classify_entry(entry, self.category_rules, self.sniffer)
     
-    def _get_date_folder(self, filepath):
+    def _get_date_folder(self, mod_time):
         """Get date-based folder name"""
-        mod_time = os.path.getmtime(filepath)
         date = datetime.fromtimestamp(mod_time)
         return date.strftime("%Y-%m")
     
@@ -291,6 +306,7 @@ class FileOrganizer:
         try:
             folder = self.source_folder.get()
             moved_count = 0
+            index = DestinationIndex()
             
             for i, file_info in enumerate(self.file_list):
                 self.root.after(0, lambda i=i: self.status_var.set(
@@ -303,22 +319,10 @@ class FileOrganizer:
                 
                 # Create destination folder if it doesn't exist
                 if not self.preview_mode.get():
-                    os.makedirs(dest_folder, exist_ok=True)
-                    
-                    # Move file
-                    dest_path = os.path.join(dest_folder, file_info['name'])
-                    
-                    # Handle duplicate names
-                    if os.path.exists(dest_path) and dest_path != file_info['path']:
-                        base, ext = os.path.splitext(file_info['name'])
-                        counter = 1
-                        while os.path.exists(dest_path):
-                            dest_path = os.path.join(dest_folder, f"{base}_{counter}{ext}")
-                            counter += 1
-                    
-                    # Move the file
-                    if dest_path != file_info['path']:
-                        shutil.move(file_info['path'], dest_path)
+                    # Move file, handling duplicate names per the collision policy
+                    result = OrganizerCore.move_file(file_info['path'], dest_folder,
+                                                     self.collision_policy.get(), index=index)
+                    if result.moved:
                         moved_count += 1
             
             if self.preview_mode.get():
@@ -363,7 +367,7 @@ class FileOrganizer:
         # Display categories
         for category, extensions in self.categories.items():
             category_text.insert(tk.END, f"{category}:\n", "category")
-            category_text.insert(tk.END, f"  {', '.join(extensions)}\n\n")
+            category_text.insert(tk.END, f"  {CategoryRules.describe(extensions)}\n\n")
         
         category_text.tag_config("category", foreground="#89b4fa", font=("Segoe UI", 10, "bold"))
         
@@ -396,7 +400,9 @@ class FileOrganizer:
         try:
             settings = {
                 'categories': self.categories,
-                'last_folder': self.source_folder.get()
+                'last_folder': self.source_folder.get(),
+                'ignore_patterns': self.ignore_patterns,
+                'collision_policy': self.collision_policy.get()
             }
             
             settings_path = os.path.join(os.path.dirname(__file__), 'organizer_settings.json')
@@ -414,6 +420,8 @@ class FileOrganizer:
                     settings = json.load(f)
                     self.categories = settings.get('categories', self.DEFAULT_CATEGORIES)
                     self.source_folder.set(settings.get('last_folder', ''))
+                    self.ignore_patterns = settings.get('ignore_patterns', [])
+                    self.collision_policy.set(settings.get('collision_policy', 'rename'))
         except Exception as e:
             print(f"Failed to load settings: {e}")
 
@@ -17,6 +17,7 @@ import threading
 import hashlib
 from collections import defaultdict
 import re
+from core_logic import OrganizerCore, IgnoreRules, CategoryRules, ContentSniffer, DestinationIndex
 
 class FileOrganizerPro:
     """Enhanced File Organizer with advanced features"""
@@ -44,6 +45,11 @@ class FileOrganizerPro:
         self.organize_mode = tk.StringVar(value="category")
         self.create_subfolders = tk.BooleanVar(value=True)
         self.preview_mode = tk.BooleanVar(value=True)
+        self.include_subfolders = tk.BooleanVar(value=False)
+        self.collision_policy = tk.StringVar(value="rename")
+        self.ignore_patterns = []
+        self.detect_mislabeled = tk.BooleanVar(value=False)
+        self.sniffer = ContentSniffer()
         self.file_list = []
         self.undo_history = []
         self.theme = tk.StringVar(value="dark")
@@ -196,6 +202,21 @@ class FileOrganizerPro:
                        variable=self.create_subfolders).pack(anchor=tk.W, pady=2)
         ttk.Checkbutton(options_frame, text="Preview mode (don't move files)",
                        variable=self.preview_mode).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(options_frame, text="Include subfolders (recursive scan)",
+                       variable=self.include_subfolders).pack(anchor=tk.W, pady=2)
+        ttk.Checkbutton(options_frame, text="Detect mislabeled files (read file headers)",
+                       variable=self.detect_mislabeled).pack(anchor=tk.W, pady=2)
+        
+        collision_frame = ttk.Frame(options_frame)
+        collision_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        ttk.Label(collision_frame, text="Identical name & content:").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Keep both (file_1)", variable=self.collision_policy,
+                       value="rename").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Skip", variable=self.collision_policy,
+                       value="skip").pack(side=tk.LEFT, padx=(0, 15))
+        ttk.Radiobutton(collision_frame, text="Remove source copy", variable=self.collision_policy,
+                       value="dedupe").pack(side=tk.LEFT)
         
         # Action buttons
         action_frame = ttk.Frame(main_frame)
@@ -458,23 +479,24 @@ class FileOrganizerPro:
     def _scan_folder_thread(self, folder):
         """Thread function to scan folder"""
         try:
-            files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-            total = len(files)
-            
-            for i, filename in enumerate(files):
-                filepath = os.path.join(folder, filename)
-                file_ext = Path(filename).suffix.lower()
-                file_size = os.path.getsize(filepath)
-                mod_time = os.path.getmtime(filepath)
-                mod_date = datetime.fromtimestamp(mod_time).strftime("%Y-%m-%d %H:%M")
+            total = 0
+            self.root.after(0, self._start_busy)
+            
+            recursive = self.include_subfolders.get()
+            ignore = IgnoreRules.load(folder, self.ignore_patterns)
+            self.category_rules = CategoryRules(self.categories)
+            self.sniff_all = self.detect_mislabeled.get()
+            for entry in OrganizerCore.scan_folder(folder, recursive=recursive, ignore=ignore):
+                file_ext = Path(entry.name).suffix.lower()
+                mod_date = datetime.fromtimestamp(entry.mtime).strftime("%Y-%m-%d %H:%M")
                 
-                destination = self._get_destination_folder(filepath, file_ext, file_size)
+                destination = self._get_destination_folder(entry)
                 
                 file_info = {
-                    'name': filename,
-                    'path': filepath,
+                    'name': entry.name,
+                    'path': entry.path,
                     'ext': file_ext,
-                    'size': file_size,
+                    'size': entry.size,
                     'modified': mod_date,
                     'destination': destination
                 }
@@ -482,31 +504,40 @@ class FileOrganizerPro:
                 self.file_list.append(file_info)
                 self.root.after(0, self._add_tree_item, file_info)
                 
-                # Update progress
-                progress = ((i + 1) / total) * 100
-                self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                self.root.after(0, lambda i=i, t=total: self.progress_label.config(
-                    text=f"Scanning: {i+1}/{t} files"))
+                total += 1
+                if total % 200 == 0:
+                    self.root.after(0, lambda t=total: self.progress_label.config(
+                        text=f"Scanning: {t} files"))
             
+            self.root.after(0, self._stop_busy)
             self.root.after(0, lambda: self.status_var.set(f"Found {total} files"))
             self.root.after(0, lambda: self.progress_label.config(text="Scan complete!"))
             self.root.after(0, self.update_statistics)
             
         except Exception as e:
+            self.root.after(0, self._stop_busy)
             self.root.after(0, lambda: messagebox.showerror("Error", f"Scan failed: {str(e)}"))
+    
+    def _start_busy(self):
+        """Run the progress bar in indeterminate mode while results stream in"""
+        self.progress_bar.config(mode='indeterminate')
+        self.progress_bar.start(15)
+    
+    def _stop_busy(self):
+        """Return the progress bar to determinate mode"""
+        self.progress_bar.stop()
+        self.progress_bar.config(mode='determinate')
+        self.progress_var.set(100)
             
-    def _get_destination_folder(self, filepath, extension, size):
+    def _get_destination_folder(self, entry):
         """Get destination folder based on organization mode"""
         mode = self.organize_mode.get()
+        size = entry.size
         
         if mode == "category":
-            for category, extensions in self.categories.items():
-                if extension in extensions:
-                    return category
-            return "Others"
+            return OrganizerCore.classify_entry(entry, self.category_rules, self.sniffer, self.sniff_all)
         elif mode == "date":
-            mod_time = os.path.getmtime(filepath)
-            date = datetime.fromtimestamp(mod_time)
+            date = datetime.fromtimestamp(entry.mtime)
             return date.strftime("%Y-%m")
         elif mode == "size":
             if size < 1024 * 1024:  # < 1MB
@@ -582,6 +613,7 @@ class FileOrganizerPro:
             moved_count = 0
             move_history = []
             total = len(self.file_list)
+            index = DestinationIndex()
             
             for i, file_info in enumerate(self.file_list):
                 self.root.after(0, lambda i=i, t=total: self.status_var.set(
@@ -598,24 +630,21 @@ class FileOrganizerPro:
                     dest_folder = folder
                 
                 if not self.preview_mode.get():
-                    os.makedirs(dest_folder, exist_ok=True)
+                    result = OrganizerCore.move_file(file_info['path'], dest_folder,
+                                                     self.collision_policy.get(), index=index)
                     
-                    dest_path = os.path.join(dest_folder, file_info['name'])
-                    
-                    if os.path.exists(dest_path) and dest_path != file_info['path']:
-                        base, ext = os.path.splitext(file_info['name'])
-                        counter = 1
-                        while os.path.exists(dest_path):
-                            dest_path = os.path.join(dest_folder, f"{base}_{counter}{ext}")
-                            counter += 1
-                    
-                    if dest_path != file_info['path']:
-                        shutil.move(file_info['path'], dest_path)
+                    if result.moved:
                         move_history.append({
                             'from': file_info['path'],
-                            'to': dest_path
+                            'to': result.dst
                         })
                         moved_count += 1
+                    elif result.status == 'deduped':
+                        move_history.append({
+                            'from': file_info['path'],
+                            'to': result.dst,
+                            'deduped': True
+                        })
             
             if not self.preview_mode.get() and move_history:
                 self.undo_history.append({
@@ -654,7 +683,10 @@ class FileOrganizerPro:
         try:
             for move in reversed(last_action['moves']):
                 if os.path.exists(move['to']):
-                    shutil.move(move['to'], move['from'])
+                    if move.get('deduped'):
+                        shutil.copy2(move['to'], move['from'])
+                    else:
+                        shutil.move(move['to'], move['from'])
             
             messagebox.showinfo("Success", f"Undone {len(last_action['moves'])} file movements")
             self.status_var.set("Undo completed successfully")
@@ -814,7 +846,7 @@ class FileOrganizerPro:
         
         for category, extensions in self.categories.items():
             self.category_text.insert(tk.END, f"{category}:\n", "category")
-            self.category_text.insert(tk.END, f"  {', '.join(extensions)}\n\n")
+            self.category_text.insert(tk.END, f"  {CategoryRules.describe(extensions)}\n\n")
         
         self.category_text.tag_config("category", foreground=self.current_theme['accent'],
                                      font=("Segoe UI", 10, "bold"))
@@ -834,9 +866,12 @@ class FileOrganizerPro:
             settings = {
                 'categories': self.categories,
                 'last_folder': self.source_folder.get(),
+                'ignore_patterns': self.ignore_patterns,
                 'theme': self.theme.get(),
                 'organize_mode': self.organize_mode.get(),
-                'create_subfolders': self.create_subfolders.get()
+                'create_subfolders': self.create_subfolders.get(),
+                'include_subfolders': self.include_subfolders.get(),
+                'collision_policy': self.collision_policy.get()
             }
             
             settings_path = os.path.join(os.path.dirname(__file__), 'organizer_settings.json')
@@ -857,9 +892,12 @@ class FileOrganizerPro:
                     settings = json.load(f)
                     self.categories = settings.get('categories', self.DEFAULT_CATEGORIES)
                     self.source_folder.set(settings.get('last_folder', ''))
+                    self.ignore_patterns = settings.get('ignore_patterns', [])
                     self.theme.set(settings.get('theme', 'dark'))
                     self.organize_mode.set(settings.get('organize_mode', 'category'))
                     self.create_subfolders.set(settings.get('create_subfolders', True))
+                    self.include_subfolders.set(settings.get('include_subfolders', False))
+                    self.collision_policy.set(settings.get('collision_policy', 'rename'))
         except Exception as e:
             print(f"Failed to load settings: {e}")
 
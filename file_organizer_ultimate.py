@@ -6,11 +6,16 @@ Author: N0b0jit
 """
 
 import os
+import shutil
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import threading
 import time
-from core_logic import OrganizerCore
+import queue
+import heapq
+import bisect
+import itertools
+from core_logic import OrganizerCore, IgnoreRules, CategoryRules, ContentSniffer, HashCache
 
 class AnimatedButton(tk.Canvas):
     """Animated button with hover effects and smooth transitions"""
@@ -53,6 +58,206 @@ class AnimatedButton(tk.Canvas):
         self.after(100, lambda: self.itemconfig(self.rect, fill=self.hover_color))
         self.command()
 
+class VirtualList(tk.Frame):
+    """Scrollable list that only draws the rows currently in view"""
+    ROW_HEIGHT = 24
+
+    def __init__(self, parent, colors, formatter, on_select=None, **kwargs):
+        super().__init__(parent, bg=colors['card'], **kwargs)
+        self.colors = colors
+        self.formatter = formatter
+        self.on_select = on_select
+        self.keys = []
+        self.items = []
+        self.top = 0
+        self.selected = None
+        self._redraw_pending = False
+
+        self.canvas = tk.Canvas(self, bg=colors['card'], highlightthickness=0)
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<MouseWheel>", lambda e: self.yview("scroll", -e.delta // 120, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.yview("scroll", 3, "units"))
+
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.ROW_HEIGHT)
+
+    def insert(self, key, item):
+        """Insert item in ascending key order; redraws are batched."""
+        index = bisect.bisect(self.keys, key)
+        self.keys.insert(index, key)
+        self.items.insert(index, item)
+        if self.selected is not None and index <= self.selected:
+            self.selected += 1
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def yview(self, *args):
+        rows = self.visible_rows()
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.items))
+        elif args[0] == "scroll":
+            step = rows if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self.top = max(0, min(self.top, len(self.items) - rows))
+        self.redraw()
+
+    def redraw(self):
+        self._redraw_pending = False
+        self.canvas.delete("all")
+        rows = self.visible_rows()
+        width = self.canvas.winfo_width()
+        for i in range(self.top, min(len(self.items), self.top + rows + 1)):
+            y = (i - self.top) * self.ROW_HEIGHT
+            if i == self.selected:
+                self.canvas.create_rectangle(0, y, width, y + self.ROW_HEIGHT,
+                                             fill=self.colors['hover'], outline="")
+            self.canvas.create_text(8, y + self.ROW_HEIGHT // 2, anchor="w", fill=self.colors['fg'],
+                                    text=self.formatter(self.items[i]), font=("Consolas", 10))
+        if self.items:
+            self.vsb.set(self.top / len(self.items), min(1.0, (self.top + rows) / len(self.items)))
+        else:
+            self.vsb.set(0, 1)
+
+    def on_click(self, e):
+        index = self.top + e.y // self.ROW_HEIGHT
+        if index < len(self.items):
+            self.selected = index
+            self.redraw()
+            if self.on_select:
+                self.on_select(self.items[index])
+
+class DuplicateResultsView(tk.Toplevel):
+    """Duplicate groups streamed in while hashing, largest savings first"""
+    ROWS_PER_TICK = 500
+
+    KEEP_LABELS = {"Keep oldest": 'oldest', "Keep newest": 'newest',
+                   "Keep shortest path": 'shortest', "Keep in preferred folder": 'preferred'}
+
+    def __init__(self, parent, colors, on_confirm=None, on_dedupe=None):
+        super().__init__(parent)
+        self.title("Duplicate Finder Results")
+        self.geometry("760x520")
+        self.configure(bg=colors['bg'])
+        self.colors = colors
+        self.on_confirm = on_confirm
+        self.on_dedupe = on_dedupe
+        self.keep_var = tk.StringVar(value="Keep oldest")
+        self.queue = queue.Queue()
+        self.pending = []
+        self.seq = itertools.count()
+        self.result = None
+        self.reclaimable = 0
+
+        self.summary = tk.Label(self, text="Hashing...", bg=colors['bg'], fg=colors['accent'],
+                                font=("Segoe UI", 11, "bold"), anchor="w")
+        self.summary.pack(fill=tk.X, padx=20, pady=(15, 5))
+
+        self.actions = tk.Frame(self, bg=colors['bg'])
+        self.actions.pack(fill=tk.X, padx=20)
+
+        self.group_list = VirtualList(self, colors, self.format_row, on_select=self.show_group)
+        self.group_list.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+
+        self.detail = tk.Text(self, height=6, bg=colors['card'], fg=colors['fg'],
+                              font=("Consolas", 10), padx=10, pady=5)
+        self.detail.pack(fill=tk.X, padx=20, pady=(0, 15))
+
+        self.pump()
+
+    def add_group(self, digest, paths, size, probable=False):
+        """Thread-safe: queue a settled group for display."""
+        self.queue.put((digest, paths, size, probable))
+
+    def pump(self):
+        """Move queued groups into the list, biggest pending savings first."""
+        if not self.winfo_exists():
+            return
+        while True:
+            try:
+                digest, paths, size, probable = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            reclaimable = (len(paths) - 1) * size
+            self.reclaimable += reclaimable
+            heapq.heappush(self.pending, (-reclaimable, next(self.seq), (digest, paths, size, probable)))
+        for _ in range(min(self.ROWS_PER_TICK, len(self.pending))):
+            key, seq, group = heapq.heappop(self.pending)
+            self.group_list.insert((key, seq), group)
+        if self.result is None:
+            self.summary.config(text=f"Hashing... {len(self.group_list.items)} groups, "
+                                     f"{OrganizerCore.format_size(self.reclaimable)} reclaimable")
+        if self.result is None or self.pending or not self.queue.empty():
+            self.after(100, self.pump)
+
+    def format_row(self, group):
+        digest, paths, size, probable = group
+        reclaimable = OrganizerCore.format_size((len(paths) - 1) * size)
+        tag = "PROBABLE " if probable else ""
+        return f"{reclaimable:>10}  {len(paths):>4} copies  {tag}{os.path.basename(paths[0])}"
+
+    def show_group(self, group):
+        digest, paths, size, probable = group
+        self.detail.delete("1.0", "end")
+        self.detail.insert("end", f"{'PROBABLE' if probable else 'HASH'}: {digest}  "
+                                  f"({OrganizerCore.format_size(size)} each)\n")
+        for p in paths:
+            self.detail.insert("end", f"  • {p}\n")
+
+    def finish(self, dups):
+        """Show the final summary and enable export/confirm."""
+        if not self.winfo_exists():
+            return
+        self.result = dups
+        count = sum(len(v)-1 for v in dups.values())
+        links = sum(len(v)-1 for v in dups.hardlinks.values())
+        self.summary.config(text=f"{count} duplicate files in {len(dups)} groups, "
+                                 f"{OrganizerCore.format_size(dups.reclaimable_bytes())} reclaimable, "
+                                 f"{links} hardlinks skipped")
+        AnimatedButton(self.actions, "⤓ Export JSONL / CSV", self.export,
+                      self.colors['hover'], self.colors['fg']).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        if dups.probable and self.on_confirm:
+            AnimatedButton(self.actions, "✔ Confirm with Full Hash", lambda: self.on_confirm(dups, self),
+                          self.colors['accent2'], self.colors['bg']).pack(side=tk.LEFT, fill=tk.X,
+                                                                          expand=True, padx=(10, 0))
+        elif len(dups) and self.on_dedupe:
+            dedupe_bar = tk.Frame(self, bg=self.colors['bg'])
+            dedupe_bar.pack(fill=tk.X, padx=20, pady=(0, 15), before=self.detail)
+            ttk.Combobox(dedupe_bar, textvariable=self.keep_var, values=list(self.KEEP_LABELS),
+                         state="readonly", width=24).pack(side=tk.LEFT, padx=(0, 10))
+            for text, action in (("🔗 Hardlink copies", 'hardlink'), ("🧬 Reflink copies", 'reflink'),
+                                 ("🗑 Delete copies", 'delete')):
+                AnimatedButton(dedupe_bar, text, lambda a=action: self.dedupe(a),
+                              self.colors['hover'], self.colors['fg']).pack(side=tk.LEFT, fill=tk.X,
+                                                                            expand=True, padx=2)
+
+    def dedupe(self, action):
+        keep = self.KEEP_LABELS[self.keep_var.get()]
+        prefer = ()
+        if keep == 'preferred':
+            folder = filedialog.askdirectory(parent=self, title="Folder whose copies to keep")
+            if not folder:
+                return
+            prefer = (folder,)
+        self.on_dedupe(self.result, action, keep, prefer, self)
+
+    def export(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".jsonl",
+                                            filetypes=[("JSON Lines", "*.jsonl"), ("CSV", "*.csv")])
+        if not path:
+            return
+        try:
+            count = OrganizerCore.export_duplicates(self.result, path)
+            messagebox.showinfo("Export", f"Wrote {count} groups to {path}", parent=self)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Export", str(e), parent=self)
+
 class FileOrganizerUltimate:
     """Ultimate File Organizer with decoupled core logic"""
     
@@ -94,13 +299,23 @@ class FileOrganizerUltimate:
         }
     }
     
+    HASH_WORKERS = min(8, os.cpu_count() or 1)
+    MOVE_WORKERS = 8
+    
     def __init__(self, root):
         self.root = root
         self.root.title("File Organizer Ultimate v3.1")
         self.root.geometry("1100x800")
         
         self.source_folder = tk.StringVar()
+        self.recursive = tk.BooleanVar(value=False)
+        self.quick_dups = tk.BooleanVar(value=False)
+        self.merge_identical = tk.BooleanVar(value=False)
         self.categories = self.DEFAULT_CATEGORIES.copy()
+        self.category_rules = CategoryRules(self.categories)
+        self.template_rules = {name: CategoryRules(cats) for name, cats in self.TEMPLATES.items()}
+        self.sniffer = ContentSniffer()
+        self.hash_cache = None
         self.file_list = []
         self.undo_history = []
         
@@ -166,6 +381,16 @@ class FileOrganizerUltimate:
         AnimatedButton(parent, "Browse Folder", self.browse_folder, 
                       self.colors['hover'], self.colors['fg']).pack(fill=tk.X, padx=15, pady=10)
 
+        tk.Checkbutton(parent, text="Include subfolders", variable=self.recursive,
+                      bg=self.colors['card'], fg=self.colors['fg'], selectcolor=self.colors['hover'],
+                      activebackground=self.colors['card'], activeforeground=self.colors['accent'],
+                      font=("Segoe UI", 10), anchor="w").pack(fill=tk.X, padx=15)
+
+        tk.Checkbutton(parent, text="Merge identical files", variable=self.merge_identical,
+                      bg=self.colors['card'], fg=self.colors['fg'], selectcolor=self.colors['hover'],
+                      activebackground=self.colors['card'], activeforeground=self.colors['accent'],
+                      font=("Segoe UI", 10), anchor="w").pack(fill=tk.X, padx=15)
+
         tk.Label(parent, text="TEMPLATES", bg=self.colors['card'], fg=self.colors['accent'],
                 font=("Segoe UI", 10, "bold")).pack(pady=(20, 5))
         
@@ -181,6 +406,11 @@ class FileOrganizerUltimate:
         
         AnimatedButton(parent, "🔎 Find Duplicates", self.find_duplicates, 
                       self.colors['accent2'], self.colors['bg']).pack(fill=tk.X, padx=15, pady=5)
+
+        tk.Checkbutton(parent, text="Quick (sampled) duplicates", variable=self.quick_dups,
+                      bg=self.colors['card'], fg=self.colors['fg'], selectcolor=self.colors['hover'],
+                      activebackground=self.colors['card'], activeforeground=self.colors['accent'],
+                      font=("Segoe UI", 10), anchor="w").pack(fill=tk.X, padx=15)
         
         AnimatedButton(parent, "✨ Organize Now", self.organize_files, 
                       self.colors['accent'], self.colors['bg']).pack(fill=tk.X, padx=15, pady=5)
@@ -254,6 +484,7 @@ class FileOrganizerUltimate:
 
     def load_template(self, name):
         self.categories = self.TEMPLATES[name].copy()
+        self.category_rules = self.template_rules[name]
         messagebox.showinfo("Ultimate", f"Applied '{name}' template successfully!")
 
     def show_status(self, msg):
@@ -272,73 +503,122 @@ class FileOrganizerUltimate:
     def _scan_thread(self, folder):
         try:
             self.file_list = []
-            files = [f for f in os.listdir(folder) if os.path.isfile(os.path.join(folder, f))]
-            total = len(files)
+            total = 0
             total_bytes = 0
+            self.root.after(0, self._start_busy)
 
-            for i, name in enumerate(files):
-                path = os.path.join(folder, name)
-                size = os.path.getsize(path)
-                dest = OrganizerCore.get_destination(name, self.categories)
+            ignore = IgnoreRules.load(folder)
+            for entry in OrganizerCore.scan_folder(folder, recursive=self.recursive.get(), ignore=ignore):
+                dest = OrganizerCore.classify_entry(entry, self.category_rules, self.sniffer)
                 
-                info = {'name': name, 'path': path, 'size': size, 'dest': dest}
+                info = {'name': entry.name, 'path': entry.path, 'size': entry.size, 'dest': dest}
                 self.file_list.append(info)
-                total_bytes += size
+                total += 1
+                total_bytes += entry.size
                 
                 self.root.after(0, lambda f=info: self.tree.insert("", "end", values=(
                     f['name'], OrganizerCore.format_size(f['size']), 
                     os.path.splitext(f['name'])[1], f['dest']
                 )))
                 
-                self.progress_var.set(((i+1)/total)*100)
+                if total % 500 == 0:
+                    self.show_status(f"Scanning... {total} files")
             
+            self.root.after(0, self._stop_busy)
             self.root.after(0, lambda: self.stats["Files"].config(text=str(total)))
             self.root.after(0, lambda: self.stats["Total Size"].config(text=OrganizerCore.format_size(total_bytes)))
             self.show_status(f"Found {total} files.")
             
         except Exception as e:
+            self.root.after(0, self._stop_busy)
             self.root.after(0, lambda: messagebox.showerror("Scan Error", str(e)))
 
+    def _start_busy(self):
+        self.progress_bar.config(mode="indeterminate")
+        self.progress_bar.start(15)
+
+    def _stop_busy(self):
+        self.progress_bar.stop()
+        self.progress_bar.config(mode="determinate")
+        self.progress_var.set(100)
+
     def find_duplicates(self):
         if not self.file_list:
             messagebox.showwarning("Warning", "Scan a folder first.")
             return
             
-        self.show_status("Hashing files (chunked)...")
+        quick = self.quick_dups.get()
+        self.show_status("Sampling files (quick)..." if quick else "Hashing files (chunked)...")
         self.progress_var.set(0)
-        threading.Thread(target=self._dup_thread, daemon=True).start()
+        view = DuplicateResultsView(self.root, self.colors, on_confirm=self.confirm_duplicates,
+                                    on_dedupe=self.dedupe_duplicates)
+        threading.Thread(target=self._dup_thread, args=(view, quick), daemon=True).start()
 
-    def _dup_thread(self):
+    def _dup_thread(self, view, quick=False, probable=None):
         paths = [f['path'] for f in self.file_list]
+        if self.hash_cache is None:
+            try:
+                self.hash_cache = HashCache()
+            except Exception as e:
+                print(f"Hash cache unavailable: {e}")
         
         def update_p(curr, total):
             self.progress_var.set((curr/total)*100)
 
-        dups = OrganizerCore.find_duplicates(paths, progress_callback=update_p)
+        if probable is not None:
+            dups = OrganizerCore.confirm_duplicates(probable, progress_callback=update_p,
+                                                    sniffer=self.sniffer, cache=self.hash_cache,
+                                                    workers=self.HASH_WORKERS,
+                                                    group_callback=view.add_group)
+        else:
+            dups = OrganizerCore.find_duplicates(paths, progress_callback=update_p,
+                                                 sniffer=self.sniffer, cache=self.hash_cache,
+                                                 workers=self.HASH_WORKERS, quick=quick,
+                                                 group_callback=view.add_group)
+        self.progress_var.set(100)
         count = sum(len(v)-1 for v in dups.values())
+        links = sum(len(v)-1 for v in dups.hardlinks.values())
+        kind = "probable duplicate" if dups.probable else "duplicate"
         
         self.root.after(0, lambda: self.stats["Duplicates"].config(text=str(count)))
-        self.show_status(f"Found {count} duplicate files.")
-        
-        if count > 0:
-            self.root.after(0, lambda: self.show_dup_dialog(dups))
+        self.show_status(f"Found {count} {kind} files "
+                         f"({OrganizerCore.format_size(dups.reclaimable_bytes())} reclaimable, "
+                         f"{links} hardlinks skipped).")
+        self.root.after(0, lambda: view.finish(dups))
 
-    def show_dup_dialog(self, dups):
-        win = tk.Toplevel(self.root)
-        win.title("Duplicate Finder Results")
-        win.geometry("600x400")
-        win.configure(bg=self.colors['bg'])
-        
-        txt = tk.Text(win, bg=self.colors['card'], fg=self.colors['fg'], font=("Consolas", 10), padx=10, pady=10)
-        txt.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
-        
-        for h, paths in dups.items():
-            txt.insert("end", f"HASH: {h}\n", "head")
-            for p in paths:
-                txt.insert("end", f"  • {os.path.basename(p)}\n")
-            txt.insert("end", "\n")
-            
-        txt.tag_config("head", foreground=self.colors['accent'], font=("Consolas", 10, "bold"))
+    def confirm_duplicates(self, dups, view):
+        view.destroy()
+        self.show_status("Confirming probable duplicates (full hash)...")
+        self.progress_var.set(0)
+        view = DuplicateResultsView(self.root, self.colors, on_dedupe=self.dedupe_duplicates)
+        threading.Thread(target=self._dup_thread, args=(view,), kwargs={'probable': dups},
+                         daemon=True).start()
+
+    def dedupe_duplicates(self, dups, action, keep, prefer, view):
+        count = sum(len(v)-1 for v in dups.values())
+        verb = {'hardlink': "Replace", 'reflink': "Reflink", 'delete': "Delete"}[action]
+        if not messagebox.askyesno("Confirm", f"{verb} {count} duplicate copies? This can be undone.",
+                                   parent=view):
+            return
+        view.destroy()
+        self.show_status("Deduplicating...")
+        self.progress_var.set(0)
+        threading.Thread(target=self._dedupe_thread, args=(dups, action, keep, prefer),
+                         daemon=True).start()
+
+    def _dedupe_thread(self, dups, action, keep, prefer):
+        def update_p(curr, total):
+            self.progress_var.set((curr/total)*100)
+
+        records, errors = OrganizerCore.dedupe(dups, action, keep, prefer, workers=self.HASH_WORKERS,
+                                               progress_callback=update_p)
+        if records:
+            self.undo_history.append(records)
+        freed = sum(r['size'] for r in records)
+        for path, err in errors:
+            print(f"Dedupe skipped {path}: {err}")
+        self.show_status(f"Deduplicated {len(records)} files, freed "
+                         f"{OrganizerCore.format_size(freed)} ({len(errors)} skipped).")
 
     def organize_files(self):
         if not self.file_list:
@@ -353,23 +633,36 @@ class FileOrganizerUltimate:
 
     def _org_thread(self):
         moves = []
+        merged = 0
         folder = self.source_folder.get()
+        collision = 'dedupe' if self.merge_identical.get() else 'rename'
         
-        for i, info in enumerate(self.file_list):
-            dest_dir = os.path.join(folder, info['dest'])
-            try:
-                new_path, moved = OrganizerCore.safe_move(info['path'], dest_dir)
-                if moved:
-                    moves.append({'from': info['path'], 'to': new_path})
-            except Exception as e:
-                print(f"Error {info['name']}: {e}")
-            
-            self.progress_var.set(((i+1)/len(self.file_list))*100)
+        def update_p(curr, total):
+            self.progress_var.set((curr/total)*100)
+
+        def update_bytes(src, copied, size):
+            # Only moves to another drive copy; show them so big files don't look stuck
+            self.show_status(f"Copying {os.path.basename(src)}: {OrganizerCore.format_size(copied)} "
+                             f"of {OrganizerCore.format_size(size)}")
+
+        results, errors = OrganizerCore.move_many(
+            ((info['path'], os.path.join(folder, info['dest'])) for info in self.file_list),
+            collision, self.hash_cache, workers=self.MOVE_WORKERS, progress_callback=update_p,
+            bytes_callback=update_bytes)
+        for result in results:
+            if result.moved:
+                moves.append({'from': result.src, 'to': result.dst})
+            elif result.status == 'deduped':
+                moves.append({'from': result.src, 'to': result.dst, 'deduped': True})
+                merged += 1
+        for src, err in errors:
+            print(f"Error {os.path.basename(src)}: {err}")
             
         if moves:
             self.undo_history.append(moves)
             
-        self.show_status(f"Organized {len(moves)} files.")
+        self.show_status(f"Organized {len(moves) - merged} files, merged {merged} identical copies."
+                         if merged else f"Organized {len(moves)} files.")
         self.root.after(0, lambda: messagebox.showinfo("Ultimate", f"Successfully organized {len(moves)} files!"))
 
     def undo_last(self):
@@ -378,10 +671,18 @@ class FileOrganizerUltimate:
             return
             
         moves = self.undo_history.pop()
+        if 'action' in moves[0]:
+            restored, errors = OrganizerCore.undo_dedupe(moves)
+            self.show_status(f"Restored {restored} deduplicated files ({len(errors)} failed).")
+            messagebox.showinfo("Undo", f"Restored {restored} files as separate copies.")
+            return
         for m in reversed(moves):
             if os.path.exists(m['to']):
                 os.makedirs(os.path.dirname(m['from']), exist_ok=True)
-                os.rename(m['to'], m['from'])
+                if m.get('deduped'):
+                    shutil.copy2(m['to'], m['from'])
+                else:
+                    os.rename(m['to'], m['from'])
                 
         self.show_status(f"Undid {len(moves)} movements.")
         messagebox.showinfo("Undo", "Successfully reverted last operation.")